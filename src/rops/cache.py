@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# compile results cache: in-memory LRU + optional on-disk tier
+#
+# key: profile name, encoding, file name and hash of encoded text
+# value: profile compile result (msg, errs, warns)
+#
+# only profiles with 'cache' key are cached: their result depends on the text alone
+# (in-process checkers); external compilers read imported modules, other files and
+# the compiler itself, which are not in the key
+#
+
+import os, hashlib, pickle, tempfile, threading, collections
+from . import store
+
+Trace = True
+
+MEM_LEN = 64 # entries in memory
+DISK_LEN = 512 # entries on disk
+
+diskDir = os.path.join(store.storeDir, 'cache')
+
+def makeKey (profName: str, encodedText: bytes, encoding: str | None, fileName: str | None) -> str:
+	assert type(encodedText) is bytes
+
+	h = hashlib.sha256()
+	for x in (profName, encoding or '', fileName or ''):
+		h.update(x.encode('utf-8', 'surrogateescape'))
+		h.update(b'\0')
+	h.update(hashlib.sha256(encodedText).digest())
+	return h.hexdigest()
+
+def cacheable (prof) -> bool:
+	return prof.get('cache', False)
+
+# do not remember failures (checker not started, message without links etc.)
+def _resultCacheable (result) -> bool:
+	msg, errs, warns = result
+	return (msg == '') or bool(errs) or bool(warns)
+
+class CompileCache:
+
+	def __init__ (self, memLen: int = MEM_LEN, diskDir: str | None = diskDir, diskLen: int = DISK_LEN):
+		self.memLen = memLen
+		self.diskDir = diskDir
+		self.diskLen = diskLen
+		self.mem = collections.OrderedDict()
+		self.lock = threading.Lock()
+
+	def get (self, key: str, disk: bool = True):
+		with self.lock:
+			r = self.mem.get(key)
+			if r is not None:
+				self.mem.move_to_end(key)
+				return r
+		if disk and (self.diskDir is not None):
+			r = self._diskGet(key)
+			if r is not None:
+				self._memPut(key, r)
+		return r
+
+	def put (self, key: str, result, disk: bool = True):
+		self._memPut(key, result)
+		if disk and (self.diskDir is not None):
+			self._diskPut(key, result)
+
+	# cached profile compile
+	# progress: (partial result) -> None, called by profiles with 'streaming' key while compiling,
+	#	see profiles.partialResult
+	# live: check as you type, results change on every typing pause: memory tier only;
+	#	results of manual compiles are kept on disk too
+	def compile (self, prof, text: str, encodedText: bytes, encoding: str | None, fileName: str | None, progress=None, live: bool = False):
+		if (progress is not None) and prof.get('streaming', False):
+			compile = lambda *args: prof['compile'](*args, progress=progress)
+		else:
+			compile = prof['compile']
+
+		if not cacheable(prof):
+			return compile(text, encodedText, encoding, fileName)
+
+		disk = not live
+		key = makeKey(prof['name'], encodedText, encoding, fileName)
+		r = self.get(key, disk)
+		if r is not None:
+			if Trace: print('compile cache hit:', key)
+			return r
+		r = compile(text, encodedText, encoding, fileName)
+		if _resultCacheable(r):
+			self.put(key, r, disk)
+		return r
+
+	def _memPut (self, key, result):
+		with self.lock:
+			self.mem[key] = result
+			self.mem.move_to_end(key)
+			while len(self.mem) > self.memLen:
+				self.mem.popitem(last=False)
+
+	def _diskGet (self, key):
+		fileName = os.path.join(self.diskDir, key)
+		try:
+			with open(fileName, 'rb') as fh:
+				r = pickle.load(fh)
+		except FileNotFoundError:
+			return None
+		except Exception as e:
+			print('Exception on load compile cache entry:', repr(e), e)
+			return None
+		else:
+			try:
+				os.utime(fileName) # LRU order on disk
+			except OSError:
+				pass
+			return r
+
+	def _diskPut (self, key, result):
+		try:
+			os.makedirs(self.diskDir, exist_ok=True)
+			fd, tmpName = tempfile.mkstemp(dir=self.diskDir, prefix='.')
+			try:
+				with os.fdopen(fd, 'wb') as fh:
+					pickle.dump(result, fh, protocol=2)
+				os.replace(tmpName, os.path.join(self.diskDir, key))
+			except:
+				os.remove(tmpName)
+				raise
+		except Exception as e:
+			print('Exception on save compile cache entry:', repr(e), e)
+		else:
+			self._diskEvict()
+
+	def _diskEvict (self):
+		try:
+			entries = [ x for x in os.scandir(self.diskDir) if not x.name.startswith('.') ]
+			if len(entries) > self.diskLen:
+				entries.sort(key=lambda x: x.stat().st_mtime)
+				for x in entries[:len(entries) - self.diskLen]:
+					os.remove(x.path)
+		except OSError as e:
+			print('Exception on evict compile cache entries:', repr(e), e)
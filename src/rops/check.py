@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+#
+# headless batch syntax checker: rops-check [options] FILE|DIR ...
+#
+# uses the IDE profiles; profile is selected by file extension
+#
+# directories are walked for known extensions, except WALK_EXCLUDE and profiles
+# with compileSavedOnly (make etc. run in the current directory): name such files explicitly
+#
+# exit status: 0 (ok), 1 (errors found), 2 (tool error: compiler not started or failed
+# without parsed errors)
+#
+
+import os, sys, locale, codecs, json, argparse, concurrent.futures
+from . import profiles, textops, encdetect, scratch, warmhost
+
+FORMATS = ('gcc', 'json')
+
+WALK_EXCLUDE = ('txt',) # extensions
+
+OK, FAILED, TOOL_ERROR = 0, 1, 2
+
+# return values: text, encoding
+def importText (prof, encodedText: bytes):
+	assert type(encodedText) is bytes
+
+	if 'import' in prof:
+		return prof['import'](encodedText), None
+
+	encoding = prof.get('preferredFileEncoding', locale.getpreferredencoding())
+	if encodedText.isascii() and encdetect.asciiCompatible(encoding):
+		return encodedText.decode('ascii'), codecs.lookup(encoding).name
+	try:
+		return encodedText.decode(encoding), codecs.lookup(encoding).name
+	except (UnicodeError, LookupError):
+		pass
+	q = encdetect.quick(encodedText)
+	if q is not None:
+		encoding, text = q
+		return text, encoding
+	encoding = encdetect.detect(encodedText)
+	if encoding is not None:
+		return encodedText.decode(encoding), encoding
+	raise UnicodeError('can not detect file encoding')
+
+def exportText (prof, text: str, encoding: str | None) -> bytes:
+	if encoding is not None:
+		return text.encode(encoding)
+	else:
+		return prof['export'](text)
+
+def msgLineText (msgLines, i):
+	if (i is not None) and (0 <= i < len(msgLines)):
+		return msgLines[i].strip()
+	else:
+		return ''
+
+def firstLine (msg: str) -> str:
+	for line in msg.split('\n'):
+		if line.strip() != '':
+			return line.strip()
+	return ''
+
+# name of command, args of env are skipped
+def toolName (args) -> str:
+	args = list(args)
+	if (len(args) > 0) and (os.path.basename(args[0]) == 'env'):
+		args = [ x for x in args[1:] if not x.startswith('-') and ('=' not in x) ] or args
+	return os.path.basename(args[0]) if len(args) > 0 else '?'
+
+# one line message about failed command run by profile compile | None
+def toolError (msg: str, errs, warns) -> str | None:
+	for args, x in profiles.runs():
+		if isinstance(x, Exception):
+			return '%s: can not start: %s' % (toolName(args), x.strerror if isinstance(x, OSError) and x.strerror else x)
+	if not errs:
+		for args, x in profiles.runs():
+			if (type(x) is int) and (x != 0):
+				line = firstLine(msg)
+				return '%s: exit status %d%s' % (toolName(args), x, ': ' + line if line != '' else '')
+	return None
+
+# runs in worker process
+# return values: status (OK | FAILED | TOOL_ERROR), diagnostics
+# diagnostic: { 'file', 'profile', 'severity', 'line', 'col', 'message' }, line and col are 1-based or None
+def checkFile (task):
+	fileName, profName = task
+	prof = profileByName(profName)
+
+	def diag (severity, line, col, message):
+		return {
+			'file': fileName,
+			'profile': profName,
+			'severity': severity,
+			'line': line,
+			'col': col,
+			'message': message,
+		}
+
+	try:
+		with open(fileName, 'rb') as fh:
+			encodedText = fh.read()
+		text, encoding = importText(prof, encodedText)
+		lineSep = prof.get('lineSep', None)
+		if lineSep is None:
+			lineSep = textops.detectLineSep(text)
+		text = textops.normalizeLineSep(text, lineSep)
+		encodedText = exportText(prof, text, encoding)
+		profiles.runsReset()
+		msg, errs, warns = prof['compile'](text, encodedText, encoding, fileName)
+	except Exception as e:
+		return FAILED, [ diag('error', None, None, '%s: %s' % (type(e).__name__, e)) ]
+
+	x = toolError(msg, errs, warns)
+	if x is not None:
+		return TOOL_ERROR, [ diag('error', None, None, 'tool error: ' + x) ]
+
+	msgLines = msg.split('\n')
+	r = []
+	for severity, links in (('error', errs), ('warning', warns)):
+		if links is not None:
+			for msgLine, (line, col) in links:
+				r.append( diag(severity,
+					None if line is None else line + 1,
+					None if col is None else col + 1,
+					msgLineText(msgLines, msgLine)) )
+	if (errs is None) and (warns is None) and (msg.strip() != ''):
+		# can not parse compiler output, source not accepted by profile etc.
+		r.append( diag('error', None, None, firstLine(msg)) )
+	if any( d['severity'] == 'error' for d in r ):
+		return FAILED, r
+	else:
+		return OK, r
+
+def profileByName (name: str):
+	for prof in profiles.profiles:
+		if prof['name'] == name:
+			return prof
+	raise KeyError(name)
+
+def formatGcc (d) -> str:
+	pos = [ d['file'] ]
+	if d['line'] is not None:
+		pos.append( str(d['line']) )
+		if d['col'] is not None:
+			pos.append( str(d['col']) )
+	return '%s: %s: %s' % (':'.join(pos), d['severity'], d['message'])
+
+def formatJson (d) -> str:
+	return json.dumps(d, ensure_ascii=False)
+
+# FILE|DIR ... -> (file, named explicitly), ...
+def collect (paths):
+	for path in paths:
+		if os.path.isdir(path):
+			for root, dirs, files in os.walk(path):
+				dirs[:] = sorted( d for d in dirs if not d.startswith('.') )
+				for f in sorted(files):
+					yield os.path.join(root, f), False
+		else:
+			yield path, True
+
+# file found by directory walk is checked
+def walkable (fileName: str, profName: str) -> bool:
+	ext = os.path.splitext(fileName)[1][1:]
+	return (ext not in WALK_EXCLUDE) and not profileByName(profName).get('compileSavedOnly', False)
+
+# return values: profile name | None
+def selectProfile (fileName: str, preferred: str | None):
+	ps = profiles.byExtension(fileName)
+	if preferred is not None:
+		for prof in ps:
+			if prof['name'] == preferred:
+				return prof['name']
+	if len(ps) > 0:
+		return ps[0]['name']
+	else:
+		return None
+
+# scratchDir: session dir of parent, workers exit without atexit cleanup
+# wineserver is started and stopped by parent
+# all errors are reported (no interactive error cap)
+def _initWorker (scratchDir: str):
+	# drivers trace to stdout, keep it for diagnostics only
+	sys.stdout = sys.stderr
+	profiles.Trace = False
+	textops.Trace = False
+	scratch.Trace = False
+	scratch.useDir(scratchDir)
+	warmhost.wine.enabled = False
+	profiles.COCO_MAX_ERRORS = None
+
+def main (argv=None):
+	parser = argparse.ArgumentParser(prog='rops-check',
+		description='check source files with rops profiles')
+	parser.add_argument('paths', metavar='FILE|DIR', nargs='+')
+	parser.add_argument('-f', '--format', choices=FORMATS, default='gcc',
+		help='diagnostics format (default: %(default)s)')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+		help='number of parallel checks (default: number of CPUs)')
+	parser.add_argument('-p', '--profile', metavar='NAME',
+		help='profile to use when several profiles match the file extension (default: the first one)')
+	args = parser.parse_args(argv)
+
+	if args.profile is not None:
+		try:
+			profileByName(args.profile)
+		except KeyError:
+			parser.error('unknown profile: %s' % (args.profile,))
+
+	fmt = { 'gcc': formatGcc, 'json': formatJson }[args.format]
+
+	status = OK
+	tasks = []
+	for fileName, explicit in collect(args.paths):
+		profName = selectProfile(fileName, args.profile)
+		if not explicit:
+			if (profName is not None) and walkable(fileName, profName):
+				tasks.append( (fileName, profName) )
+		elif profName is None:
+			print(fmt({ 'file': fileName, 'profile': None, 'severity': 'error', 'line': None, 'col': None,
+				'message': 'can not lookup profile by file extension' }))
+			status = max(status, FAILED)
+		else:
+			tasks.append( (fileName, profName) )
+
+	if len(tasks) > 0:
+		scratch.Trace = False
+		wine = (not profiles.mswindows) and any( profileByName(profName).get('wine', False) for fileName, profName in tasks )
+		if wine:
+			warmhost.Trace = False
+			warmhost.wine.ensure()
+		try:
+			with concurrent.futures.ProcessPoolExecutor(max_workers=max(args.jobs, 1),
+					initializer=_initWorker, initargs=(scratch.sessionDir(),)) as ex:
+				for fileStatus, diags in ex.map(checkFile, tasks):
+					for d in diags:
+						print(fmt(d))
+					status = max(status, fileStatus)
+		finally:
+			if wine:
+				warmhost.wine.shutdown()
+		sys.stdout.flush()
+
+	return status
+
+if __name__ == '__main__':
+	sys.exit( main() )
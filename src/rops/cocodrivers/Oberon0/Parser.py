@@ -42,133 +42,126 @@ class ErrorRec( object ):
       self.str    = s
 
 
+class TooManyErrors( Exception ):   # raised by Errors when maxErrors errors detected
+   pass
+
+
 class Errors( object ):
    errMsgFormat = "file %(file)s : (%(line)d, %(col)d) %(text)s\n"
-   eof          = False
-   count        = 0         # number of errors detected
-   fileName     = ''
-   listName     = ''
-   mergeErrors  = False
-   mergedList   = None      # PrintWriter
-   errors       = [ ]
    minErrDist   = 2
-   errDist      = minErrDist
-      # A function with prototype: f( errorNum=None ) where errorNum is a
-      # predefined error number.  f returns a tuple, ( line, column, message )
-      # such that line and column refer to the location in the
-      # source file most recently parsed.  message is the error
-      # message corresponging to errorNum.
-
-   @staticmethod
-   def Init( fn, dir, merge, getParsingPos, errorMessages ):
-      Errors.theErrors = [ ]
-      Errors.getParsingPos = getParsingPos
-      Errors.errorMessages = errorMessages
-      Errors.fileName = fn
-      listName = dir + 'listing.txt'
-      Errors.mergeErrors = merge
-      if Errors.mergeErrors and Trace:
+
+   # per-parse error collection, owned by Parser
+   #
+   # getParsingPos: a function with prototype: f( ) which returns a tuple,
+   # ( line, column ) of the location in the source file most recently parsed.
+   # errorMessages: { errorNum: message }
+   # maxErrors: stop parsing (raise TooManyErrors) when so many errors detected, None: no limit
+   def __init__( self, fn, dir, merge, getParsingPos, errorMessages, maxErrors=None ):
+      self.eof           = False
+      self.count         = 0         # number of errors detected
+      self.maxErrors     = maxErrors
+      self.errors        = [ ]
+      self.errDist       = Errors.minErrDist
+      self.getParsingPos = getParsingPos
+      self.errorMessages = errorMessages
+      self.fileName      = fn
+      self.listName      = dir + 'listing.txt'
+      self.mergeErrors   = merge
+      self.mergedList    = None      # PrintWriter
+      if self.mergeErrors and Trace:
          try:
-            Errors.mergedList = open( listName, 'w' )
+            self.mergedList = open( self.listName, 'w' )
          except IOError:
-            raise RuntimeError( '-- Compiler Error: could not open ' + listName )
+            raise RuntimeError( '-- Compiler Error: could not open ' + self.listName )
 
-   @staticmethod
-   def storeError( line, col, s ):
-      if Errors.mergeErrors:
-         Errors.errors.append( ErrorRec( line, col, s ) )
+   def storeError( self, line, col, s ):
+      if self.mergeErrors:
+         self.errors.append( ErrorRec( line, col, s ) )
       else:
-         Errors.printMsg( Errors.fileName, line, col, s )
-
-   @staticmethod
-   def SynErr( errNum, errPos=None ):
-      line,col = errPos if errPos else Errors.getParsingPos( )
-      msg = Errors.errorMessages[ errNum ]
-      Errors.storeError( line, col, msg )
-      Errors.count += 1
-
-   @staticmethod
-   def SemErr( errMsg, errPos=None ):
-      line,col = errPos if errPos else Errors.getParsingPos( )
-      Errors.storeError( line, col, errMsg )
-      Errors.count += 1
-
-   @staticmethod
-   def Warn( errMsg, errPos=None ):
-      line,col = errPos if errPos else Errors.getParsingPos( )
-      Errors.storeError( line, col, errMsg )
-
-   @staticmethod
-   def Exception( errMsg ):
+         self.printMsg( self.fileName, line, col, s )
+
+   def SynErr( self, errNum, errPos=None ):
+      line,col = errPos if errPos else self.getParsingPos( )
+      msg = self.errorMessages[ errNum ]
+      self.storeError( line, col, msg )
+      self.count += 1
+      self.checkCount( )
+
+   def SemErr( self, errMsg, errPos=None ):
+      line,col = errPos if errPos else self.getParsingPos( )
+      self.storeError( line, col, errMsg )
+      self.count += 1
+      self.checkCount( )
+
+   def checkCount( self ):
+      if (self.maxErrors is not None) and (self.count >= self.maxErrors):
+         raise TooManyErrors( )
+
+   def Warn( self, errMsg, errPos=None ):
+      line,col = errPos if errPos else self.getParsingPos( )
+      self.storeError( line, col, errMsg )
+
+   def Exception( self, errMsg ):
       print(errMsg)
       assert False
 
-   @staticmethod
-   def printMsg( fileName, line, column, msg ):
+   def printMsg( self, fileName, line, column, msg ):
       vals = { 'file':fileName, 'line':line, 'col':column, 'text':msg }
-      sys.stdio.write( Errors.errMsgFormat % vals )
+      sys.stdout.write( Errors.errMsgFormat % vals )
 
-   @staticmethod
-   def display( s, e ):
+   def display( self, s, e ):
       assert Trace
-      Errors.mergedList.write('**** ')
-      for c in xrange( 1, e.col ):
+      self.mergedList.write('**** ')
+      for c in range( 1, e.col ):
          if s[c-1] == '\t':
-            Errors.mergedList.write( '\t' )
+            self.mergedList.write( '\t' )
          else:
-            Errors.mergedList.write( ' ' )
-      Errors.mergedList.write( '^ ' + e.str + '\n')
+            self.mergedList.write( ' ' )
+      self.mergedList.write( '^ ' + e.str + '\n')
 
-   @staticmethod
-   def Summarize( sourceBuffer ):
-      if Errors.mergeErrors:
+   def Summarize( self, sourceBuffer ):
+      if self.mergeErrors and Trace:
          # Initialize the line iterator
          srcLineIter = iter(sourceBuffer)
-         srcLineStr  = next(srcLineIter)
+         srcLineStr  = next(srcLineIter, '')
          srcLineNum  = 1
 
          try:
             # Initialize the error iterator
-            errIter = iter(Errors.errors)
+            errIter = iter(self.errors)
             errRec  = next(errIter)
 
             # Advance to the source line of the next error
             while srcLineNum < errRec.line:
-               if Trace:
-                   Errors.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
+               self.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
 
                srcLineStr = next(srcLineIter)
                srcLineNum += 1
 
             # Write out all errors for the current source line
             while errRec.line == srcLineNum:
-               if Trace:
-                  Errors.display( srcLineStr, errRec )
+               self.display( srcLineStr, errRec )
 
                errRec = next(errIter)
-         except:
+         except StopIteration:
             pass
 
          # No more errors to report
-         try:
-            # Advance to end of source file
-            while True:
-               Errors.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
+         # Advance to end of source file
+         while srcLineStr is not None:
+            self.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
 
-               srcLineStr = next(srcLineIter)
-               srcLineNum += 1
-         except:
-            pass
+            srcLineStr = next(srcLineIter, None)
+            srcLineNum += 1
 
-         if Trace:
-            Errors.mergedList.write( '\n' )
-            Errors.mergedList.write( '%d errors detected\n' % Errors.count )
-            Errors.mergedList.close( )
+         self.mergedList.write( '\n' )
+         self.mergedList.write( '%d errors detected\n' % self.count )
+         self.mergedList.close( )
 
       if Trace:
-         sys.stdout.write( '%d errors detected\n' % Errors.count )
-         if (Errors.count > 0) and Errors.mergeErrors:
-            sys.stdout.write( 'see ' + Errors.listName + '\n' )
+         sys.stdout.write( '%d errors detected\n' % self.count )
+         if (self.count > 0) and self.mergeErrors:
+            sys.stdout.write( 'see ' + self.listName + '\n' )
 
 
 class Parser( object ):
@@ -182,7 +175,7 @@ class Parser( object ):
    minErrDist = 2
 
 
-   def __init__( self ):
+   def __init__( self, maxErrors=None ):
       self.scanner     = None
       self.token       = None           # last recognized token
       self.la          = None           # lookahead token
@@ -190,30 +183,31 @@ class Parser( object ):
       self.tokenString = ''             # used in declarations of literal tokens
       self.noString    = '-none-'       # used in declarations of literal tokens
       self.errDist     = Parser.minErrDist
+      self.errors      = Errors( '', '', True, self.getParsingPos, self.errorMessages, maxErrors )
 
    def getParsingPos( self ):
       return self.la.line, self.la.col
 
    def SynErr( self, errNum ):
       if self.errDist >= Parser.minErrDist:
-         Errors.SynErr( errNum )
+         self.errors.SynErr( errNum )
 
       self.errDist = 0
 
    def SemErr( self, msg ):
       if self.errDist >= Parser.minErrDist:
-         Errors.SemErr( msg )
+         self.errors.SemErr( msg )
 
       self.errDist = 0
 
    def Warning( self, msg ):
       if self.errDist >= Parser.minErrDist:
-         Errors.Warn( msg )
+         self.errors.Warn( msg )
 
       self.errDist = 0
 
    def Successful( self ):
-      return Errors.count == 0;
+      return self.errors.count == 0
 
    def LexString( self ):
       return self.token.val
@@ -238,7 +232,7 @@ class Parser( object ):
          self.SynErr( n )
 
    def StartOf( self, s ):
-      return self.set[s][self.la.kind]
+      return (self.sets[s] >> self.la.kind) & 1
 
    def ExpectWeak( self, n, follow ):
       if self.la.kind == n:
@@ -249,17 +243,15 @@ class Parser( object ):
             self.Get( )
 
    def WeakSeparator( self, n, syFol, repFol ):
-      s = [ False for i in xrange( Parser.maxT+1 ) ]
       if self.la.kind == n:
          self.Get( )
          return True
       elif self.StartOf(repFol):
          return False
       else:
-         for i in xrange( Parser.maxT ):
-            s[i] = self.set[syFol][i] or self.set[repFol][i] or self.set[0][i]
+         sync = self.syncSets[syFol, repFol]
          self.SynErr( n )
-         while not s[self.la.kind]:
+         while not (sync >> self.la.kind) & 1:
             self.Get( )
          return self.StartOf( syFol )
 
@@ -318,26 +310,28 @@ class Parser( object ):
    def expression( self ):
       self.SimpleExpression()
       if (self.StartOf(1)):
-         if self.la.kind == 9:
+         kind = self.la.kind
+         if kind == 9:
             self.Get( )
-         elif self.la.kind == 20:
+         elif kind == 20:
             self.Get( )
-         elif self.la.kind == 21:
+         elif kind == 21:
             self.Get( )
-         elif self.la.kind == 22:
+         elif kind == 22:
             self.Get( )
-         elif self.la.kind == 23:
+         elif kind == 23:
             self.Get( )
          else:
             self.Get( )
          self.SimpleExpression()
 
    def type( self ):
-      if self.la.kind == 1:
+      kind = self.la.kind
+      if kind == 1:
          self.Get( )
-      elif self.la.kind == 14:
+      elif kind == 14:
          self.ArrayType()
-      elif self.la.kind == 16:
+      elif kind == 16:
          self.RecordType()
       else:
          self.SynErr(45)
@@ -414,9 +408,10 @@ class Parser( object ):
             self.Get( )
       self.term()
       while self.la.kind == 25 or self.la.kind == 26 or self.la.kind == 27:
-         if self.la.kind == 25:
+         kind = self.la.kind
+         if kind == 25:
             self.Get( )
-         elif self.la.kind == 26:
+         elif kind == 26:
             self.Get( )
          else:
             self.Get( )
@@ -426,11 +421,12 @@ class Parser( object ):
    def term( self ):
       self.factor()
       while self.StartOf(2):
-         if self.la.kind == 28:
+         kind = self.la.kind
+         if kind == 28:
             self.Get( )
-         elif self.la.kind == 29:
+         elif kind == 29:
             self.Get( )
-         elif self.la.kind == 30:
+         elif kind == 30:
             self.Get( )
          else:
             self.Get( )
@@ -438,7 +434,8 @@ class Parser( object ):
 
 
    def factor( self ):
-      if self.la.kind == 1:
+      kind = self.la.kind
+      if kind == 1:
          self.Get( )
          if self.la.kind == 18:
             self.Get( )
@@ -451,13 +448,13 @@ class Parser( object ):
             self.selector()
          else:
             self.SynErr(46)
-      elif self.la.kind == 2:
+      elif kind == 2:
          self.Get( )
-      elif self.la.kind == 18:
+      elif kind == 18:
          self.Get( )
          self.expression()
          self.Expect(19)
-      elif self.la.kind == 32:
+      elif kind == 32:
          self.Get( )
          self.factor()
       else:
@@ -476,18 +473,20 @@ class Parser( object ):
 
    def statement( self ):
       if (self.StartOf(4)):
-         if self.la.kind == 1:
+         kind = self.la.kind
+         if kind == 1:
             self.AssignmentOrProcedureCall()
-         elif self.la.kind == 35:
+         elif kind == 35:
             self.IfStatement()
-         elif self.la.kind == 39:
+         elif kind == 39:
             self.WhileStatement()
          else:
             self.RepeatStatement()
 
    def AssignmentOrProcedureCall( self ):
       self.Expect(1)
-      if self.la.kind == 7 or self.la.kind == 33 or self.la.kind == 43:
+      kind = self.la.kind
+      if kind == 7 or kind == 33 or kind == 43:
          self.selector()
          self.Get( )
          self.expression()
@@ -610,3 +609,11 @@ class Parser( object ):
       47 : "invalid factor",
       48 : "invalid AssignmentOrProcedureCall",
       }
+
+
+# sets as int bitmasks, bit k: token kind k
+Parser.sets = tuple( sum( 1 << k for k, b in enumerate(s) if b ) for s in Parser.set )
+
+# WeakSeparator synchronization sets: syFol | repFol | EOF
+Parser.syncSets = { (syFol, repFol): Parser.sets[syFol] | Parser.sets[repFol] | Parser.sets[0]
+   for syFol in range( len(Parser.sets) ) for repFol in range( len(Parser.sets) ) }
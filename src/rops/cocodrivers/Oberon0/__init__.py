@@ -1,3 +1,3 @@
-from .Oberon0 import Process
+from .Oberon0 import Process, Session
 
-all = [ 'Process' ]
+all = [ 'Process', 'Session' ]
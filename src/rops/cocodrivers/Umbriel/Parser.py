@@ -42,133 +42,126 @@ class ErrorRec( object ):
       self.str    = s
 
 
+class TooManyErrors( Exception ):   # raised by Errors when maxErrors errors detected
+   pass
+
+
 class Errors( object ):
    errMsgFormat = "file %(file)s : (%(line)d, %(col)d) %(text)s\n"
-   eof          = False
-   count        = 0         # number of errors detected
-   fileName     = ''
-   listName     = ''
-   mergeErrors  = False
-   mergedList   = None      # PrintWriter
-   errors       = [ ]
    minErrDist   = 2
-   errDist      = minErrDist
-      # A function with prototype: f( errorNum=None ) where errorNum is a
-      # predefined error number.  f returns a tuple, ( line, column, message )
-      # such that line and column refer to the location in the
-      # source file most recently parsed.  message is the error
-      # message corresponging to errorNum.
-
-   @staticmethod
-   def Init( fn, dir, merge, getParsingPos, errorMessages ):
-      Errors.theErrors = [ ]
-      Errors.getParsingPos = getParsingPos
-      Errors.errorMessages = errorMessages
-      Errors.fileName = fn
-      listName = dir + 'listing.txt'
-      Errors.mergeErrors = merge
-      if Errors.mergeErrors and Trace:
+
+   # per-parse error collection, owned by Parser
+   #
+   # getParsingPos: a function with prototype: f( ) which returns a tuple,
+   # ( line, column ) of the location in the source file most recently parsed.
+   # errorMessages: { errorNum: message }
+   # maxErrors: stop parsing (raise TooManyErrors) when so many errors detected, None: no limit
+   def __init__( self, fn, dir, merge, getParsingPos, errorMessages, maxErrors=None ):
+      self.eof           = False
+      self.count         = 0         # number of errors detected
+      self.maxErrors     = maxErrors
+      self.errors        = [ ]
+      self.errDist       = Errors.minErrDist
+      self.getParsingPos = getParsingPos
+      self.errorMessages = errorMessages
+      self.fileName      = fn
+      self.listName      = dir + 'listing.txt'
+      self.mergeErrors   = merge
+      self.mergedList    = None      # PrintWriter
+      if self.mergeErrors and Trace:
          try:
-            Errors.mergedList = open( listName, 'w' )
+            self.mergedList = open( self.listName, 'w' )
          except IOError:
-            raise RuntimeError( '-- Compiler Error: could not open ' + listName )
+            raise RuntimeError( '-- Compiler Error: could not open ' + self.listName )
 
-   @staticmethod
-   def storeError( line, col, s ):
-      if Errors.mergeErrors:
-         Errors.errors.append( ErrorRec( line, col, s ) )
+   def storeError( self, line, col, s ):
+      if self.mergeErrors:
+         self.errors.append( ErrorRec( line, col, s ) )
       else:
-         Errors.printMsg( Errors.fileName, line, col, s )
-
-   @staticmethod
-   def SynErr( errNum, errPos=None ):
-      line,col = errPos if errPos else Errors.getParsingPos( )
-      msg = Errors.errorMessages[ errNum ]
-      Errors.storeError( line, col, msg )
-      Errors.count += 1
-
-   @staticmethod
-   def SemErr( errMsg, errPos=None ):
-      line,col = errPos if errPos else Errors.getParsingPos( )
-      Errors.storeError( line, col, errMsg )
-      Errors.count += 1
-
-   @staticmethod
-   def Warn( errMsg, errPos=None ):
-      line,col = errPos if errPos else Errors.getParsingPos( )
-      Errors.storeError( line, col, errMsg )
-
-   @staticmethod
-   def Exception( errMsg ):
+         self.printMsg( self.fileName, line, col, s )
+
+   def SynErr( self, errNum, errPos=None ):
+      line,col = errPos if errPos else self.getParsingPos( )
+      msg = self.errorMessages[ errNum ]
+      self.storeError( line, col, msg )
+      self.count += 1
+      self.checkCount( )
+
+   def SemErr( self, errMsg, errPos=None ):
+      line,col = errPos if errPos else self.getParsingPos( )
+      self.storeError( line, col, errMsg )
+      self.count += 1
+      self.checkCount( )
+
+   def checkCount( self ):
+      if (self.maxErrors is not None) and (self.count >= self.maxErrors):
+         raise TooManyErrors( )
+
+   def Warn( self, errMsg, errPos=None ):
+      line,col = errPos if errPos else self.getParsingPos( )
+      self.storeError( line, col, errMsg )
+
+   def Exception( self, errMsg ):
       print(errMsg)
       assert False
 
-   @staticmethod
-   def printMsg( fileName, line, column, msg ):
+   def printMsg( self, fileName, line, column, msg ):
       vals = { 'file':fileName, 'line':line, 'col':column, 'text':msg }
-      sys.stdio.write( Errors.errMsgFormat % vals )
+      sys.stdout.write( Errors.errMsgFormat % vals )
 
-   @staticmethod
-   def display( s, e ):
+   def display( self, s, e ):
       assert Trace
-      Errors.mergedList.write('**** ')
-      for c in xrange( 1, e.col ):
+      self.mergedList.write('**** ')
+      for c in range( 1, e.col ):
          if s[c-1] == '\t':
-            Errors.mergedList.write( '\t' )
+            self.mergedList.write( '\t' )
          else:
-            Errors.mergedList.write( ' ' )
-      Errors.mergedList.write( '^ ' + e.str + '\n')
+            self.mergedList.write( ' ' )
+      self.mergedList.write( '^ ' + e.str + '\n')
 
-   @staticmethod
-   def Summarize( sourceBuffer ):
-      if Errors.mergeErrors:
+   def Summarize( self, sourceBuffer ):
+      if self.mergeErrors and Trace:
          # Initialize the line iterator
          srcLineIter = iter(sourceBuffer)
-         srcLineStr  = next(srcLineIter)
+         srcLineStr  = next(srcLineIter, '')
          srcLineNum  = 1
 
          try:
             # Initialize the error iterator
-            errIter = iter(Errors.errors)
+            errIter = iter(self.errors)
             errRec  = next(errIter)
 
             # Advance to the source line of the next error
             while srcLineNum < errRec.line:
-               if Trace:
-                   Errors.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
+               self.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
 
                srcLineStr = next(srcLineIter)
                srcLineNum += 1
 
             # Write out all errors for the current source line
             while errRec.line == srcLineNum:
-               if Trace:
-                  Errors.display( srcLineStr, errRec )
+               self.display( srcLineStr, errRec )
 
                errRec = next(errIter)
-         except:
+         except StopIteration:
             pass
 
          # No more errors to report
-         try:
-            # Advance to end of source file
-            while True:
-               Errors.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
+         # Advance to end of source file
+         while srcLineStr is not None:
+            self.mergedList.write( '%4d %s\n' % (srcLineNum, srcLineStr) )
 
-               srcLineStr = next(srcLineIter)
-               srcLineNum += 1
-         except:
-            pass
+            srcLineStr = next(srcLineIter, None)
+            srcLineNum += 1
 
-         if Trace:
-            Errors.mergedList.write( '\n' )
-            Errors.mergedList.write( '%d errors detected\n' % Errors.count )
-            Errors.mergedList.close( )
+         self.mergedList.write( '\n' )
+         self.mergedList.write( '%d errors detected\n' % self.count )
+         self.mergedList.close( )
 
       if Trace:
-         sys.stdout.write( '%d errors detected\n' % Errors.count )
-         if (Errors.count > 0) and Errors.mergeErrors:
-            sys.stdout.write( 'see ' + Errors.listName + '\n' )
+         sys.stdout.write( '%d errors detected\n' % self.count )
+         if (self.count > 0) and self.mergeErrors:
+            sys.stdout.write( 'see ' + self.listName + '\n' )
 
 
 class Parser( object ):
@@ -185,7 +178,7 @@ class Parser( object ):
    minErrDist = 2
 
 
-   def __init__( self ):
+   def __init__( self, maxErrors=None ):
       self.scanner     = None
       self.token       = None           # last recognized token
       self.la          = None           # lookahead token
@@ -193,30 +186,31 @@ class Parser( object ):
       self.tokenString = ''             # used in declarations of literal tokens
       self.noString    = '-none-'       # used in declarations of literal tokens
       self.errDist     = Parser.minErrDist
+      self.errors      = Errors( '', '', True, self.getParsingPos, self.errorMessages, maxErrors )
 
    def getParsingPos( self ):
       return self.la.line, self.la.col
 
    def SynErr( self, errNum ):
       if self.errDist >= Parser.minErrDist:
-         Errors.SynErr( errNum )
+         self.errors.SynErr( errNum )
 
       self.errDist = 0
 
    def SemErr( self, msg ):
       if self.errDist >= Parser.minErrDist:
-         Errors.SemErr( msg )
+         self.errors.SemErr( msg )
 
       self.errDist = 0
 
    def Warning( self, msg ):
       if self.errDist >= Parser.minErrDist:
-         Errors.Warn( msg )
+         self.errors.Warn( msg )
 
       self.errDist = 0
 
    def Successful( self ):
-      return Errors.count == 0;
+      return self.errors.count == 0
 
    def LexString( self ):
       return self.token.val
@@ -241,7 +235,7 @@ class Parser( object ):
          self.SynErr( n )
 
    def StartOf( self, s ):
-      return self.set[s][self.la.kind]
+      return (self.sets[s] >> self.la.kind) & 1
 
    def ExpectWeak( self, n, follow ):
       if self.la.kind == n:
@@ -252,17 +246,15 @@ class Parser( object ):
             self.Get( )
 
    def WeakSeparator( self, n, syFol, repFol ):
-      s = [ False for i in xrange( Parser.maxT+1 ) ]
       if self.la.kind == n:
          self.Get( )
          return True
       elif self.StartOf(repFol):
          return False
       else:
-         for i in xrange( Parser.maxT ):
-            s[i] = self.set[syFol][i] or self.set[repFol][i] or self.set[0][i]
+         sync = self.syncSets[syFol, repFol]
          self.SynErr( n )
-         while not s[self.la.kind]:
+         while not (sync >> self.la.kind) & 1:
             self.Get( )
          return self.StartOf( syFol )
 
@@ -287,25 +279,26 @@ class Parser( object ):
       self.Expect(10)
 
    def Declaration( self ):
-      if self.la.kind == 11:
+      kind = self.la.kind
+      if kind == 11:
          self.Get( )
          while self.la.kind == 1:
             self.ConstantDeclaration()
             self.Expect(7)
 
-      elif self.la.kind == 12:
+      elif kind == 12:
          self.Get( )
          while self.la.kind == 1:
             self.TypeDeclaration()
             self.Expect(7)
 
-      elif self.la.kind == 13:
+      elif kind == 13:
          self.Get( )
          while self.la.kind == 1:
             self.VariableDeclaration()
             self.Expect(7)
 
-      elif self.la.kind == 23:
+      elif kind == 23:
          self.ProcedureDeclaration()
          self.Expect(7)
       else:
@@ -358,11 +351,12 @@ class Parser( object ):
       self.Expect(1)
 
    def Type( self ):
-      if self.la.kind == 1:
+      kind = self.la.kind
+      if kind == 1:
          self.TypeIdentifier()
-      elif self.la.kind == 15:
+      elif kind == 15:
          self.ArrayType()
-      elif self.la.kind == 21:
+      elif kind == 21:
          self.RecordType()
       else:
          self.SynErr(62)
@@ -438,9 +432,10 @@ class Parser( object ):
       self.TypeIdentifier()
 
    def FormalParameter( self ):
-      if self.la.kind == 1:
+      kind = self.la.kind
+      if kind == 1:
          self.ValueSpecification()
-      elif self.la.kind == 13:
+      elif kind == 13:
          self.VariableSpecification()
       else:
          self.SynErr(63)
@@ -458,28 +453,30 @@ class Parser( object ):
 
    def Statement( self ):
       if (self.StartOf(3)):
-         if self.la.kind == 1:
+         kind = self.la.kind
+         if kind == 1:
             self.AssignmentOrCall()
-         elif self.la.kind == 27:
+         elif kind == 27:
             self.IfStatement()
-         elif self.la.kind == 31:
+         elif kind == 31:
             self.CaseStatement()
-         elif self.la.kind == 33:
+         elif kind == 33:
             self.WhileStatement()
-         elif self.la.kind == 35:
+         elif kind == 35:
             self.RepeatStatement()
-         elif self.la.kind == 37:
+         elif kind == 37:
             self.ForStatement()
-         elif self.la.kind == 40:
+         elif kind == 40:
             self.LoopStatement()
-         elif self.la.kind == 41:
+         elif kind == 41:
             self.ExitStatement()
          else:
             self.ReturnStatement()
 
    def AssignmentOrCall( self ):
       self.VarOrProcIdentifier()
-      if self.la.kind == 8 or self.la.kind == 18 or self.la.kind == 26:
+      kind = self.la.kind
+      if kind == 8 or kind == 18 or kind == 26:
          while self.la.kind == 8 or self.la.kind == 18:
             self.Selector()
 
@@ -568,10 +565,11 @@ class Parser( object ):
       self.Expect(1)
 
    def Selector( self ):
-      if self.la.kind == 8:
+      kind = self.la.kind
+      if kind == 8:
          self.Get( )
          self.VariableIdentifier()
-      elif self.la.kind == 18:
+      elif kind == 18:
          self.Get( )
          self.IndexList()
          self.Expect(20)
@@ -644,19 +642,20 @@ class Parser( object ):
 
 
    def Relation( self ):
-      if self.la.kind == 14:
+      kind = self.la.kind
+      if kind == 14:
          self.Get( )
-      elif self.la.kind == 54:
+      elif kind == 54:
          self.Get( )
-      elif self.la.kind == 55:
+      elif kind == 55:
          self.Get( )
-      elif self.la.kind == 56:
+      elif kind == 56:
          self.Get( )
-      elif self.la.kind == 57:
+      elif kind == 57:
          self.Get( )
-      elif self.la.kind == 58:
+      elif kind == 58:
          self.Get( )
-      elif self.la.kind == 59:
+      elif kind == 59:
          self.Get( )
       else:
          self.SynErr(66)
@@ -669,11 +668,12 @@ class Parser( object ):
 
 
    def AddOperator( self ):
-      if self.la.kind == 43:
+      kind = self.la.kind
+      if kind == 43:
          self.Get( )
-      elif self.la.kind == 44:
+      elif kind == 44:
          self.Get( )
-      elif self.la.kind == 53:
+      elif kind == 53:
          self.Get( )
       else:
          self.SynErr(67)
@@ -705,27 +705,29 @@ class Parser( object ):
          self.SynErr(69)
 
    def MulOperator( self ):
-      if self.la.kind == 47:
+      kind = self.la.kind
+      if kind == 47:
          self.Get( )
-      elif self.la.kind == 48:
+      elif kind == 48:
          self.Get( )
-      elif self.la.kind == 49:
+      elif kind == 49:
          self.Get( )
-      elif self.la.kind == 50:
+      elif kind == 50:
          self.Get( )
-      elif self.la.kind == 51 or self.la.kind == 52:
+      elif kind == 51 or kind == 52:
          self.AndOperator()
       else:
          self.SynErr(70)
 
    def ConstantLiteral( self ):
-      if self.la.kind == 3:
+      kind = self.la.kind
+      if kind == 3:
          self.Get( )
-      elif self.la.kind == 4:
+      elif kind == 4:
          self.Get( )
-      elif self.la.kind == 2:
+      elif kind == 2:
          self.Get( )
-      elif self.la.kind == 5:
+      elif kind == 5:
          self.Get( )
       else:
          self.SynErr(71)
@@ -734,17 +736,19 @@ class Parser( object ):
       self.Expect(1)
 
    def NotOperator( self ):
-      if self.la.kind == 45:
+      kind = self.la.kind
+      if kind == 45:
          self.Get( )
-      elif self.la.kind == 46:
+      elif kind == 46:
          self.Get( )
       else:
          self.SynErr(72)
 
    def AndOperator( self ):
-      if self.la.kind == 51:
+      kind = self.la.kind
+      if kind == 51:
          self.Get( )
-      elif self.la.kind == 52:
+      elif kind == 52:
          self.Get( )
       else:
          self.SynErr(73)
@@ -850,3 +854,11 @@ class Parser( object ):
       72 : "invalid NotOperator",
       73 : "invalid AndOperator",
       }
+
+
+# sets as int bitmasks, bit k: token kind k
+Parser.sets = tuple( sum( 1 << k for k, b in enumerate(s) if b ) for s in Parser.set )
+
+# WeakSeparator synchronization sets: syFol | repFol | EOF
+Parser.syncSets = { (syFol, repFol): Parser.sets[syFol] | Parser.sets[repFol] | Parser.sets[0]
+   for syFol in range( len(Parser.sets) ) for repFol in range( len(Parser.sets) ) }
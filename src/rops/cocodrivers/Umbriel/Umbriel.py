@@ -2,18 +2,50 @@
 
 from . import Scanner
 from . import Parser
+from .. import incremental
 
 
 
-def Process (s):
+# maxErrors: stop after so many errors, None: no limit
+def Process (s, maxErrors=None):
 	scanner = Scanner.Scanner(s)
-	parser = Parser.Parser()
+	parser = Parser.Parser(maxErrors)
 
-	Parser.Errors.Init('', '', True, parser.getParsingPos, parser.errorMessages)
-	Parser.Errors.errors = []
-	Parser.Errors.count = 0
+	try:
+		parser.Parse(scanner)
+	except Parser.TooManyErrors:
+		pass
+	parser.errors.Summarize(scanner.buffer)
 
-	parser.Parse(scanner)
-	Parser.Errors.Summarize(scanner.buffer)
+	return tuple( [ (e.line, e.col, e.str) for e in parser.errors.errors ] )
 
-	return tuple( [ (e.line, e.col, e.str) for e in Parser.Errors.errors ] )
+# incremental re-parse: checkpoints at top-level declarations
+class IncrementalParser( incremental.Checkpoints, Parser.Parser ):
+	TooManyErrors = Parser.TooManyErrors
+
+	depth = 0 # of procedure declarations
+
+	def Declaration (self):
+		if self.depth == 0:
+			self.checkpoint()
+		Parser.Parser.Declaration(self)
+
+	def ProcedureDeclaration (self):
+		self.depth += 1
+		Parser.Parser.ProcedureDeclaration(self)
+		self.depth -= 1
+
+	# module block from top-level declaration
+	def ResumeTopLevel (self):
+		while self.StartOf(1):
+			self.Declaration()
+
+		if (self.la.kind == 9):
+			self.Get( )
+			self.StatementSequence()
+		self.Expect(10)
+		self.ModuleIdentifier()
+		self.Expect(8)
+
+def Session ():
+	return incremental.Session(Scanner.Scanner, IncrementalParser)
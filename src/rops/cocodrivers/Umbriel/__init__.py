@@ -1,3 +1,3 @@
-from .Umbriel import Process
+from .Umbriel import Process, Session
 
-all = [ 'Process' ]
+all = [ 'Process', 'Session' ]
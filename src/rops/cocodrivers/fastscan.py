@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+#
+# table-driven scanner engine for Coco/R generated grammars:
+# one compiled master regex over the whole source instead of
+# a character by character state machine, dict-based literals lookup
+#
+# produces the same tokens (kind, pos, line, col, val) as Coco/R frames
+#
+
+import re
+from array import array
+from itertools import islice
+
+_pLoneCR = re.compile('\r(?!\n)')
+
+_COMMENT = -1 # action kind of comment start
+
+FILL_BATCH = 512 # tokens scanned at once by Scanner.fill
+
+# Coco/R Buffer.Read masks characters to 8 bits,
+# Scanner.NextCh replaces isolated '\r' by '\n'
+def prepare (s: str) -> str:
+	if not s.isascii() and (max(s) > '\xff'):
+		s = bytes( memoryview(s.encode('utf-32-le', 'surrogatepass'))[::4] ).decode('latin-1')
+	if '\r' in s:
+		s = _pLoneCR.sub('\n', s)
+	return s
+
+class Spec:
+
+	# ignore: characters to skip
+	# tokens: ( (pattern, kind, back), ... ), first matching pattern wins,
+	#	back: number of characters of token value to scan again
+	# literals: { literal: kind }, keywords and operators
+	# ident: kind of tokens to lookup in literals
+	# noSym: kind of unrecognized character
+	# comments: ( (start, end, nested), ... )
+	def __init__ (self, ignore: str, tokens, literals, ident: int, noSym: int, comments=()):
+		identPattern = [ pattern for pattern, kind, back in tokens if kind == ident ]
+		operators = [ x for x in literals if not any( re.fullmatch(pattern, x) for pattern in identPattern ) ]
+		if operators:
+			# longest first; kind of operator is looked up in literals (kind None)
+			operators.sort(key=len, reverse=True)
+			tokens = tuple(tokens) + ( ('|'.join( re.escape(x) for x in operators ), None, 0), )
+
+		# master pattern: white space, then one of comment starts or tokens
+		alternatives = []
+		self.actions = []
+		for start, end, nested in comments:
+			alternatives.append( '(' + re.escape(start) + ')' )
+			self.actions.append( (_COMMENT, start) )
+		for pattern, kind, back in tokens:
+			assert re.compile(pattern).groups == 0, pattern
+			alternatives.append( '(' + pattern + ')' )
+			self.actions.append( (kind, back) )
+		if ignore != '':
+			ignore = '[' + re.escape(ignore) + ']*'
+		self.ignore = re.compile( ignore )
+		self.master = re.compile( ignore + '(?:' + '|'.join(alternatives) + ')' )
+		self.literals = dict(literals)
+		self.ident = ident
+		self.noSym = noSym
+		self.commentEnds = {}
+		for start, end, nested in comments:
+			if nested:
+				self.commentEnds[start] = (end, re.compile( re.escape(start) + '|' + re.escape(end) ))
+			else:
+				self.commentEnds[start] = (end, None)
+
+	# s[p:] starts with comment start, return values: end of comment | -1 (not terminated)
+	def skipComment (self, s: str, p: int, start: str) -> int:
+		end, startOrEnd = self.commentEnds[start]
+		p = p + len(start)
+		if startOrEnd is None:
+			q = s.find(end, p)
+			return -1 if q < 0 else q + len(end)
+		level = 1
+		search = startOrEnd.search
+		while True:
+			m = search(s, p)
+			if m is None:
+				return -1
+			p = m.end()
+			if m.group() == end:
+				level = level - 1
+				if level == 0:
+					return p
+			else:
+				level = level + 1
+
+# length of common prefix of a and b
+def commonPrefixLength (a: str, b: str) -> int:
+	n = min(len(a), len(b))
+	lo = 0
+	step = 4096
+	while True:
+		if lo >= n:
+			return n
+		hi = min(lo + step, n)
+		if not a.startswith(b[lo:hi], lo):
+			break
+		lo = hi
+		step = step * 2
+	# a[:lo] == b[:lo], a[lo:hi] != b[lo:hi]
+	while hi - lo > 1:
+		mid = (lo + hi) // 2
+		if a.startswith(b[lo:mid], lo):
+			lo = mid
+		else:
+			hi = mid
+	return lo
+
+# scan prepared source, yield (kind, pos, line, col, end) for all tokens including EOF (kind 0),
+# value of token is s[pos:end]
+def scan (spec: Spec, s: str, pos: int = 0, line: int = 1, lineStart: int = 0):
+	n = len(s)
+	match = spec.master.match
+	actions = spec.actions
+	literals = spec.literals
+	ident = spec.ident
+	count = s.count
+	rfind = s.rfind
+	find = s.find
+
+	nl = find('\n', pos) # first newline not counted in line
+	while True:
+		m = match(s, pos)
+		if m is None:
+			p = spec.ignore.match(s, pos).end()
+			if p >= n:
+				break
+			kind = spec.noSym
+			end = p + 1
+			pos = end
+		else:
+			i = m.lastindex
+			kind, back = actions[i - 1]
+			p, end = m.span(i) # group i ends the match
+			if kind == _COMMENT:
+				pos = spec.skipComment(s, p, back)
+				if pos < 0: # not terminated: up to EOF
+					break
+				continue
+			pos = end - back
+
+		if 0 <= nl < p:
+			line = line + count('\n', nl, p)
+			lineStart = rfind('\n', nl, p) + 1
+			nl = find('\n', p)
+
+		if kind == ident:
+			kind = literals.get(s[p:end], ident)
+		elif kind is None:
+			kind = literals[s[p:end]]
+		yield (kind, p, line, p - lineStart + 1, end)
+
+	if 0 <= nl:
+		line = line + count('\n', nl)
+		lineStart = rfind('\n', nl) + 1
+	yield (0, n, line, n - lineStart + 1, n)
+
+# token of grammar scanner, value is sliced from source on demand
+class Token( object ):
+	__slots__ = ( 'kind', 'pos', 'col', 'line', '_val', '_src', '_end' )
+
+	def __init__( self, kind=0, pos=0, col=0, line=0, src=None, end=0 ):
+		self.kind = kind # token kind
+		self.pos = pos # token position in the source text (starting at 0)
+		self.col = col # token column (starting at 1)
+		self.line = line # token line (starting at 1)
+		self._src = src
+		self._end = end
+		self._val = u'' if src is None else None
+
+	@property
+	def val( self ):
+		if self._val is None:
+			self._val = self._src[self.pos:self._end]
+		return self._val
+
+	@val.setter
+	def val( self, value ):
+		self._val = value
+
+# base of grammar scanners, grammar scanner sets:
+#	spec, bufferClass, maxT
+#
+# input is scanned on demand, as Scan and Peek ask for tokens, by FILL_BATCH tokens;
+# scanned tokens are kept in columns (arrays) kind, pos, line, col, end;
+# Token objects are made by Scan and Peek
+#
+# prev: scanner of previous version of the source, its tokens before editStart are reused;
+# editStart: position of first changed character, None: compare sources
+class Scanner( object ):
+	eofSym = 0
+
+	def __init__( self, s, prev=None, editStart=None ):
+		self.buffer = self.bufferClass( s ) # the buffer instance
+
+		self.src = prepare( s )
+		self.kind = array('i')
+		self.pos = array('i')
+		self.line = array('i')
+		self.col = array('i')
+		self.end = array('i')
+
+		k = 0 # reused tokens
+		if prev is not None:
+			if editStart is None:
+				editStart = commonPrefixLength( prev.src, self.src )
+			else:
+				editStart = min( editStart, len(prev.src), len(self.src) )
+			k = prev.reusable( editStart )
+		if k > 0:
+			for column in ('kind', 'pos', 'line', 'col', 'end'):
+				getattr(self, column).extend( getattr(prev, column)[:k] )
+			pos = prev.pos[k]
+			self.source = scan( self.spec, self.src, pos, prev.line[k], pos - prev.col[k] + 1 )
+		else:
+			self.source = scan( self.spec, self.src ) # None when EOF scanned
+		self.reused = k
+
+		self.last = k - 1 # last scanned token
+		self.t = -1 # current token
+		self.pt = -1 # current peek token
+
+	# number of leading tokens which do not depend on source from editStart:
+	# scanning of token reads at most one character after it,
+	# isolated '\r' depends on the next character;
+	# scanning restarts from start of the next token
+	def reusable( self, editStart ):
+		n = self.last + 1
+		lo = 0
+		hi = n
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self.end[mid] + 2 <= editStart:
+				lo = mid + 1
+			else:
+				hi = mid
+		return max(lo - 1, 0)
+
+	# scan up to token i (and further by FILL_BATCH tokens), return values: i | index of EOF token
+	def fill( self, i ):
+		while i > self.last:
+			if self.source is None:
+				return self.last
+			batch = list( islice( self.source, max(i - self.last, FILL_BATCH) ) )
+			kind, pos, line, col, end = zip( *batch )
+			self.kind.extend( kind )
+			self.pos.extend( pos )
+			self.line.extend( line )
+			self.col.extend( col )
+			self.end.extend( end )
+			self.last += len(batch)
+			if kind[-1] == self.eofSym: # last token of source
+				self.source = None
+		return i
+
+	def token( self, i ):
+		kind = self.kind[i]
+		if kind == self.eofSym:
+			t = Token( kind, self.pos[i], self.col[i], self.line[i] )
+			t.val = u'EOF'
+			return t
+		return Token( kind, self.pos[i], self.col[i], self.line[i], self.src, self.end[i] )
+
+	def Scan( self ):
+		t = self.t + 1
+		if t >= self.last: # next token is needed for pt
+			self.fill( t + 1 )
+			if t > self.last: # EOF scanned
+				t = self.last
+		self.t = t
+		if t < self.last:
+			self.pt = t + 1
+		else:
+			self.pt = t
+		kind = self.kind[t]
+		if kind == self.eofSym:
+			return self.token( t )
+		return Token( kind, self.pos[t], self.col[t], self.line[t], self.src, self.end[t] )
+
+	def Peek( self ):
+		self.pt = self.fill( self.pt + 1 )
+		while self.kind[self.pt] > self.maxT:
+			self.pt = self.fill( self.pt + 1 )
+
+		return self.token( self.pt )
+
+	def ResetPeek( self ):
+		self.pt = self.t
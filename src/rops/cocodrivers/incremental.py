@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# incremental re-parse for Coco/R generated grammars:
+# tokens before the edit are reused (see fastscan.Scanner),
+# parsing restarts from the last checkpoint before the edit
+#
+# checkpoint: parser state at a top-level declaration boundary,
+#	( lookahead token index, errDist, number of errors, errors count );
+# the state depends only on tokens up to the lookahead token
+#
+
+import threading
+from .fastscan import Token
+
+# mixin for generated Parser, grammar parser calls checkpoint at top-level declarations
+# and implements ResumeTopLevel: rest of the top-level production from checkpoint
+class Checkpoints( object ):
+
+	def __init__( self, *args ):
+		super().__init__( *args )
+		self.checkpoints = []
+
+	def checkpoint( self ):
+		errors = self.errors
+		self.checkpoints.append( (self.scanner.t, self.errDist, len(errors.errors), errors.count) )
+
+	# continue parse of scanner from checkpoint cp,
+	# errors: errors of parse which recorded cp
+	def Resume( self, scanner, cp, errors ):
+		la, errDist, nErrors, count = cp
+		self.scanner = scanner
+		scanner.t = la
+		scanner.pt = scanner.fill( la + 1 )
+		self.la = scanner.token( la )
+		if la > 0:
+			self.token = scanner.token( la - 1 )
+		else:
+			self.token = Token( )
+		self.errDist = errDist
+		self.errors.errors = errors[:nErrors]
+		self.errors.count = count
+		self.ResumeTopLevel()
+		self.Expect(0)
+
+# incremental parse of versions of one source
+class Session( object ):
+
+	# parserClass: generated Parser with Checkpoints mixed in, sets TooManyErrors
+	def __init__( self, scannerClass, parserClass ):
+		self.scannerClass = scannerClass
+		self.parserClass = parserClass
+		self.lock = threading.Lock()
+		self.scanner = None # of previous version
+		self.checkpoints = []
+		self.errors = []
+
+	# same as grammar Process;
+	# editStart: position of first changed character since previous call, None: compare sources
+	def Process( self, s, maxErrors=None, editStart=None ):
+		with self.lock:
+			scanner = self.scannerClass( s, self.scanner, editStart )
+			parser = self.parserClass( maxErrors )
+
+			# last checkpoint with reused lookahead token
+			cp = None
+			i = 0
+			for x in self.checkpoints:
+				la, errDist, nErrors, count = x
+				if (la >= scanner.reused) or ((maxErrors is not None) and (count >= maxErrors)):
+					break
+				cp = x
+				i = i + 1
+			if cp is not None:
+				parser.checkpoints = self.checkpoints[:i - 1] # cp will be recorded again
+			else:
+				parser.checkpoints = []
+
+			try:
+				if cp is None:
+					parser.Parse(scanner)
+				else:
+					parser.Resume(scanner, cp, self.errors)
+			except parser.TooManyErrors:
+				pass
+			parser.errors.Summarize(scanner.buffer)
+
+			self.scanner = scanner
+			self.checkpoints = parser.checkpoints
+			self.errors = parser.errors.errors
+
+			return tuple( [ (e.line, e.col, e.str) for e in parser.errors.errors ] )
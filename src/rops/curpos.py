@@ -8,23 +8,53 @@ from . import store
 Trace = True
 
 storeName = 'curpos'
+encStoreName = 'fileenc'
 
-CUR_POS_DB_LEN = 1000
+CUR_POS_DB_LEN = 1000 # default capacity
+
+# pickle db of previous versions: { fileName: (line, col, last) }, last: 0 - most recent
+def _migrate (db):
+	return [ (k, (l, c), -last) for k, (l, c, last) in db.items() ]
+
+# per file values, store keeps capacity recently used ones
+# (stamps of table items, written behind, see store.flush)
+class FileLRU:
+
+	def __init__ (self, table: store.Table, capacity: int = CUR_POS_DB_LEN):
+		self.table = table
+		self.capacity = capacity
+
+	def get (self, key: str):
+		r = self.table.get(key)
+		if r is not None:
+			self.table.touch(key)
+		return r
+
+	def put (self, key: str, value):
+		return self.table.put(key, value, self.capacity)
+
+	# applied to store on next put
+	def setCapacity (self, capacity: int):
+		assert capacity > 0
+		self.capacity = capacity
+
+_lru = FileLRU( store.Table(storeName, _migrate) ) # realpath -> (line, col)
+_encLru = FileLRU( store.Table(encStoreName) ) # realpath -> (encoding, lineSep, size, mtime_ns)
+
+def setCapacity (capacity: int):
+	_lru.setCapacity(capacity)
+	_encLru.setCapacity(capacity)
 
 def loadCurPos (fileName: str):
 	assert fileName is not None
 
-	db = store.load(storeName, None)
-	if db is not None:
-		r = db.get( os.path.realpath(fileName) )
-		if r is not None:
-			line, col, last = r
-			if Trace: print('loaded cursor position:', line, col)
-			return line, col
-		else:
-			if Trace: print('can not restore cursor position: not saved')
-			return 0, 0
+	r = _lru.get( os.path.realpath(fileName) )
+	if r is not None:
+		line, col = r
+		if Trace: print('loaded cursor position:', line, col)
+		return line, col
 	else:
+		if Trace: print('can not restore cursor position: not saved')
 		return 0, 0
 
 def saveCurPos (fileName: str, line: int, col: int):
@@ -33,31 +63,32 @@ def saveCurPos (fileName: str, line: int, col: int):
 	if (line == 0) and (col == 0):
 		pass
 	else:
-		db = store.load(storeName, {})
-
-		key = os.path.realpath(fileName)
-		oldVal = db.get(key)
-		if oldVal is None:
-			toDel = None
-			for k, v in db.items():
-				l, c, last = v
-				if last == CUR_POS_DB_LEN - 1:
-					assert toDel is None
-					toDel = k
-				else:
-					db[k] = (l, c, last + 1)
-			if toDel is not None:
-				del db[toDel]
-				if Trace: print(toDel, 'removed from cursor position db')
-		else:
-			oldLast = oldVal[2]
-			for k, v in db.items():
-				l, c, last = v
-				if last < oldLast:
-					db[k] = (l, c, last + 1)
-
-		db[key] = (line, col, 0)
-
-		ok = store.save(storeName, db)
-		if ok:
-			if Trace: print('saved cursor position:', line, col)
+		_lru.put(os.path.realpath(fileName), (line, col))
+		if Trace: print('saved cursor position:', line, col)
+
+# encoding and line separator of file, valid while size and mtime of file are the same
+# return values: (encoding, lineSep) | None
+def loadFileEncoding (fileName: str):
+	assert fileName is not None
+
+	try:
+		st = os.stat(fileName)
+	except OSError:
+		return None
+	r = _encLru.get( os.path.realpath(fileName) )
+	if r is not None:
+		encoding, lineSep, size, mtime = r
+		if (size == st.st_size) and (mtime == st.st_mtime_ns):
+			if Trace: print('loaded file encoding:', encoding, repr(lineSep))
+			return encoding, lineSep
+	return None
+
+# call after file is read or written
+def saveFileEncoding (fileName: str, encoding: str, lineSep: str):
+	assert fileName is not None
+
+	try:
+		st = os.stat(fileName)
+	except OSError:
+		return
+	_encLru.put(os.path.realpath(fileName), (encoding, lineSep, st.st_size, st.st_mtime_ns))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# encoding detection of file contents:
+#   ASCII and UTF-8 are checked by one pass of decoder (C), chardet is not imported for them;
+#   otherwise chardet UniversalDetector is fed by bounded samples until it is sure
+#
+
+import codecs, importlib.util
+
+SAMPLE_SIZE = 64 * 1024 # bytes
+SAMPLES = 16 # max number of samples of large data: head and evenly spaced
+
+_chardet = None # module | False (not found), imported on first detect
+
+normalizeEncoding = lambda enc: codecs.lookup(enc).name
+
+def chardetAvailable () -> bool:
+	if _chardet is None:
+		return importlib.util.find_spec('chardet') is not None
+	return _chardet is not False
+
+def _chardetModule ():
+	global _chardet
+	if _chardet is None:
+		try:
+			import chardet
+		except ImportError:
+			_chardet = False
+		else:
+			_chardet = chardet
+	return _chardet or None
+
+_asciiCompatible = {}
+
+# ASCII data is decoded by encoding as by ASCII
+def asciiCompatible (encoding: str) -> bool:
+	r = _asciiCompatible.get(encoding)
+	if r is None:
+		try:
+			r = bytes(range(128)).decode(encoding) == ''.join(map(chr, range(128)))
+		except (UnicodeError, LookupError):
+			r = False
+		_asciiCompatible[encoding] = r
+	return r
+
+# return values: (encoding, text) for ASCII or UTF-8 data | None
+def quick (data: bytes):
+	if data.isascii():
+		return 'ascii', data.decode('ascii')
+	if data.startswith(codecs.BOM_UTF8):
+		encoding = 'utf-8-sig'
+	else:
+		encoding = 'utf-8'
+	try:
+		return encoding, data.decode(encoding)
+	except UnicodeDecodeError:
+		return None
+
+# offsets of samples
+def _samples (n: int):
+	if n <= SAMPLE_SIZE * SAMPLES:
+		return range(0, n, SAMPLE_SIZE)
+	last = n - SAMPLE_SIZE
+	return [ i * last // (SAMPLES - 1) for i in range(SAMPLES) ]
+
+# data: bytes | mmap, return values: encoding (normalized) | None
+def detect (data) -> str | None:
+	chardet = _chardetModule()
+	if chardet is None:
+		return None
+	detector = chardet.UniversalDetector()
+	for start in _samples(len(data)):
+		detector.feed(data[start:start + SAMPLE_SIZE])
+		if detector.done:
+			break
+	detector.close()
+	encoding = detector.result['encoding']
+	if encoding is None:
+		return None
+	try:
+		return normalizeEncoding(encoding)
+	except LookupError:
+		return None
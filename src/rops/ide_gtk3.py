@@ -31,22 +31,29 @@ except ValueError:
 else:
 	GTKSV = True
 
-import os, sys, locale, codecs, re
-try:
-	import chardet
-except ImportError:
-	print('chardet module not found => automatic encoding detection will not available!')
-	CHARDET = False
-else:
-	CHARDET = True
+import os, sys, locale, codecs, mmap, itertools, threading, concurrent.futures
 
-from . import profiles, util, curpos, store, textops
+from . import profiles, util, curpos, store, textops, worker, cache, encdetect
 from .translate import tr, setLang as setTrLang
+from .textops import detectLineSep, splitToLines, normalizeLineSep
+
+CHARDET = encdetect.chardetAvailable() # imported on first detection
+if not CHARDET:
+	print('chardet module not found => automatic encoding detection will not available!')
 
 Trace = True
 
 mswindows = sys.platform == 'win32'
 
+# diagnostics list: severities of message lines, row colors
+MSG_ERROR, MSG_WARNING, MSG_OTHER = 0, 1, 2
+msgColors = { MSG_ERROR: 'pink', MSG_WARNING: 'yellow', MSG_OTHER: None }
+MSG_FILL_BATCH = 500 # rows added to diagnostics list per main loop iteration
+LARGE_FILE_SIZE = 16 * 1024 * 1024 # bytes, files from this size are loaded by chunks, see do_open_large
+LARGE_FILE_SAMPLE = 1024 * 1024 # bytes, head of large file to detect encoding and line separator
+LOAD_CHUNK = 1024 * 1024 # bytes, inserted into buffer per main loop iteration
+srcMarkCategories = { MSG_ERROR: 'error', MSG_WARNING: 'warning' } # GtkSource mark categories
+
 def fileNameToGtk (fileName):
 	assert type(fileName) is str
 	return fileName
@@ -202,7 +209,7 @@ def NewSrcTextSView ():
 
 	return view
 
-normalizeEncoding = lambda enc: codecs.lookup(enc).name
+normalizeEncoding = encdetect.normalizeEncoding
 
 def decodeText (encodedText: bytes, encoding: str):
 	assert type(encodedText) is bytes
@@ -215,8 +222,9 @@ def decodeText (encodedText: bytes, encoding: str):
 	else:
 		return text
 
+# knownEncoding: remembered encoding of file, tried first
 # return values: None | 'CANCEL' | text, encoding, autoDetected
-def importText (prof, encodedText: bytes, parent):
+def importText (prof, encodedText: bytes, parent, knownEncoding=None):
 	assert type(encodedText) is bytes
 
 	if 'import' in prof:
@@ -237,59 +245,79 @@ def importText (prof, encodedText: bytes, parent):
 
 		if Trace: print('preferredImportEncoding:', preferredEncoding)
 
-		text = decodeText(encodedText, preferredEncoding)
-		if text is not None:
-			preferredEncoding = normalizeEncoding(preferredEncoding)
-		else:
-			preferredEncoding = None
-
-		if CHARDET:
-			cd = chardet.detect(encodedText)
-			if Trace: print('autoImportEncoding:', cd)
-			autoEncoding = cd['encoding']
-			if (autoEncoding is not None) and (autoEncoding != 'ascii'):
-				text1 = decodeText(encodedText, autoEncoding)
-				if text1 is not None:
-					autoEncoding = normalizeEncoding(autoEncoding)
-					if text is None:
-						text = text1
-					del text1
-				else:
-					if Trace: print('decoding with autoImportEncoding failed')
-					autoEncoding = None
+		if knownEncoding is not None:
+			text = decodeText(encodedText, knownEncoding)
+			if text is not None:
+				if Trace: print('importEncoding:', knownEncoding, '(remembered)')
+				return text, knownEncoding, False
+			if Trace: print('decoding with remembered encoding failed')
+
+		# text is decoded once by encoding, which is detected by fast path or chosen
+		q = encdetect.quick(encodedText)
+		if (q is not None) and (q[0] == 'ascii'):
+			text = q[1]
+			if encdetect.asciiCompatible(preferredEncoding):
+				encoding = normalizeEncoding(preferredEncoding)
 			else:
-				autoEncoding = None
-		else:
-			autoEncoding = None
-
-		if (preferredEncoding is None) and (autoEncoding is None):
-			return None # can not detect file encoding
-		elif preferredEncoding is None: # autoEncoding is not None
-			encoding = autoEncoding
-			autoDetected = True
-		elif autoEncoding is None: # preferredEncoding is not None
-			encoding = preferredEncoding
-			autoDetected = False
-		elif preferredEncoding == autoEncoding:
-			encoding = preferredEncoding
+				encoding = 'ascii'
 			autoDetected = False
-		else: # both present, but differ
-			items = (
-				"%s (%s)" % (preferredEncoding, tr("#system encoding")),
-				"%s (%s)" % (autoEncoding, tr("#auto-detected encoding"))
-			)
-			idx = SelectItem(
-				parent,
-				tr('#Select file encoding'),
-				tr('#Name'),
-				items
-			)
-			if idx is None:
-				return 'CANCEL'
+			if Trace: print('autoImportEncoding: ascii')
+		else:
+			if q is not None: # UTF-8
+				autoEncoding, autoText = q
 			else:
-				encoding = { 0: preferredEncoding, 1: autoEncoding }[idx]
-				text = encodedText.decode(encoding)
+				autoEncoding = encdetect.detect(encodedText) if CHARDET else None
+				autoText = None
+				if autoEncoding is not None:
+					# detected by samples: offered only if it decodes whole text
+					autoText = decodeText(encodedText, autoEncoding)
+					if autoText is None:
+						if Trace: print('decoding with autoImportEncoding failed:', autoEncoding)
+						autoEncoding = None
+			if Trace: print('autoImportEncoding:', autoEncoding)
+
+			try:
+				preferredEncoding = normalizeEncoding(preferredEncoding)
+			except LookupError:
+				preferredEncoding = None
+			if (preferredEncoding is not None) and (preferredEncoding == autoEncoding):
+				text = autoText
+			else:
+				text = decodeText(encodedText, preferredEncoding) if preferredEncoding is not None else None
+				if text is None:
+					preferredEncoding = None
+
+			if (preferredEncoding is None) and (autoEncoding is None):
+				return None # can not detect file encoding
+			elif preferredEncoding is None: # autoEncoding is not None
+				encoding = autoEncoding
+				autoDetected = True
+			elif autoEncoding is None: # preferredEncoding is not None
+				encoding = preferredEncoding
+				autoDetected = False
+			elif preferredEncoding == autoEncoding:
+				encoding = preferredEncoding
 				autoDetected = False
+			else: # both present, but differ
+				items = (
+					"%s (%s)" % (preferredEncoding, tr("#system encoding")),
+					"%s (%s)" % (autoEncoding, tr("#auto-detected encoding"))
+				)
+				idx = SelectItem(
+					parent,
+					tr('#Select file encoding'),
+					tr('#Name'),
+					items
+				)
+				if idx is None:
+					return 'CANCEL'
+				else:
+					encoding = { 0: preferredEncoding, 1: autoEncoding }[idx]
+					autoDetected = False
+
+			if encoding == autoEncoding:
+				text = autoText
+			del autoText
 
 		if Trace: print('importEncoding:', encoding)
 
@@ -433,8 +461,20 @@ def SelectItem (parent, title, name, items):
 exMsg = lambda e: ''.join(traceback.format_exception(e))
 
 def doCompile (base):
-	text = getText(base.srcTextView)
-	text = normalizeLineSep(text, base.mod['lineSep'])
+	if base.loadSource is not None:
+		base.msg_set( tr('#File is loading') )
+		return
+
+	prof = base.mod['profile']
+	if prof.get('compileSavedOnly', False):
+		# submitted compile may hold the file renamed to backup: drop or finish it first
+		base.compiler.cancel()
+		profiles.terminate()
+		base.compiler.wait()
+		base.save_wait()
+
+	bufText = getText(base.srcTextView)
+	text = normalizeLineSep(bufText, base.mod['lineSep'])
 	try:
 		encodedText, encoding = exportText(base.mod, text)
 	except Exception as e:
@@ -444,13 +484,15 @@ def doCompile (base):
 	bakFileName = None
 	if base.mod['profile'].get('compileSavedOnly', False):
 		if base.mod['fileName'] is None:
-			allow = base.do_save()
+			allow = base.do_save(wait=True)
 		elif base.srcTextView.get_buffer().get_modified():
 			# bakFileName = os.tempnam(os.path.dirname(os.path.realpath(base.mod['fileName'])), os.path.basename(base.mod['fileName'] + '.'))
 			bakFileName = tempfile.mktemp(dir=os.path.dirname(os.path.realpath(base.mod['fileName'])), prefix= os.path.basename(base.mod['fileName'] + '.'))
+			base.backupFree.clear() # until renamed back by job
 			try:
 				os.rename(base.mod['fileName'], bakFileName)
 			except Exception as e:
+				base.backupFree.set()
 				print('can not rename', base.mod['fileName'], 'to', bakFileName)
 				msg = tr('#File rename error') + ': ' + exMsg(e)
 				base.msg_set(msg)
@@ -473,6 +515,7 @@ def doCompile (base):
 					err.append(msg1)
 					err.reverse()
 					base.msg_set('\n'.join(err))
+					base.backupFree.set()
 					allow = False
 				else:
 					allow = True
@@ -482,28 +525,77 @@ def doCompile (base):
 		allow = True
 
 	if allow:
-		try:
-			msg, errs, warns = base.mod['profile']['compile']( text, encodedText, encoding, base.mod['fileName'] )
-		finally:
+		fileName = base.mod['fileName']
+		generation = [ None ] # of submitted job, known in main loop
+		source = (base.bufVersion, bufText) # compiled buffer, see compile_links
+
+		# partial result of streaming profile, on the compile worker thread
+		def progress (result):
+			GObject.idle_add(base.compile_progress, generation[0], source, result)
+
+		# return values: None | error msg
+		def restore ():
+			try: # destination file must not exists on rename (Windows)
+				os.remove(fileName)
+			except:
+				pass
+			try:
+				os.rename(bakFileName, fileName)
+			except Exception as e:
+				return "%s (%s): %s" % (tr('#File rename error'), tr('#back'), exMsg(e))
+			finally:
+				base.backupFree.set()
+
+		# runs on the compile worker thread
+		def job ():
+			try:
+				r = base.compileCache.compile( prof, text, encodedText, encoding, fileName, progress )
+			finally:
+				if bakFileName is not None:
+					msg1 = restore()
+					if msg1 is not None:
+						return (msg1, None, None)
+			return r
+
+		# job dropped before start (superseded, cancelled)
+		def dropped ():
 			if bakFileName is not None:
-				try: # destination file must not exists on rename (Windows)
-					os.remove(base.mod['fileName'])
-				except:
-					pass
-				try:
-					os.rename(bakFileName, base.mod['fileName'])
-				except Exception as e:
-					msg1 = "%s (%s): %s" % (tr('#File rename error'), tr('#back'), exMsg(e))
-					base.msg_set(msg1)
-					return
+				msg1 = restore()
+				if msg1 is not None:
+					print(msg1)
 
-		assert msg is not None
-		base.msg_set(msg, errs=errs, warns=warns)
+		def done (generation, result, exc):
+			GObject.idle_add(base.compile_done, generation, source, result, exc)
 
-		if (errs is not None) and (len(errs) > 0):
-			msgLine, pos = errs[0]
-			line, col = pos
-			setCursorPos(base.srcTextView, line, col)
+		if base.compiler.busy():
+			profiles.terminate()
+		base.compileJumped = False
+		generation[0] = base.compiler.submit(job, done, dropped)
+		base.msg_set( tr('#Compiling...') )
+
+# check as you type, see profile 'liveCheck' key
+def doLiveCheck (base):
+	prof = base.mod['profile']
+	assert not prof.get('compileSavedOnly', False)
+
+	version = base.bufVersion
+	text = getText(base.srcTextView)
+	text = normalizeLineSep(text, base.mod['lineSep'])
+	try:
+		encodedText, encoding = exportText(base.mod, text)
+	except Exception as e:
+		if Trace: print('live check: text convert error:', repr(e))
+		return
+	fileName = base.mod['fileName']
+
+	# runs on the compile worker thread
+	def job ():
+		return base.compileCache.compile( prof, text, encodedText, encoding, fileName, live=True )
+
+	def done (generation, result, exc):
+		GObject.idle_add(base.live_check_done, generation, version, result, exc)
+
+	base.compiler.submit(job, done)
 
 def getCursorPos (buffer):
 	mark = buffer.get_insert()
@@ -528,6 +620,26 @@ def setCursorPos (textView, line, col):
 		# textView.scroll_to_iter(it, ...) не пользуемся, потому что срабатывает не всегда (см. документацию Gtk.TextView)
 		textView.scroll_to_mark(buffer.get_insert(), 0.0, True, 1.0, 0.5)
 
+# source range of diagnostic: word at (line, col) | line without leading spaces (col is None)
+def diagRange (buffer, line, col):
+	start = buffer.get_iter_at_line(line)
+	lineEnd = start.copy()
+	if not lineEnd.ends_line():
+		lineEnd.forward_to_line_end()
+	if col is None:
+		while (start.get_char() in (' ', '\t')) and not start.ends_line():
+			start.forward_char()
+		return start, lineEnd
+	start.set_line_offset( min(col, lineEnd.get_line_offset()) )
+	if start.ends_line() and (start.get_line_offset() > 0):
+		start.backward_char()
+	end = start.copy()
+	if end.starts_word() or end.inside_word():
+		end.forward_word_end()
+	elif not end.ends_line():
+		end.forward_char()
+	return start, end
+
 def restoreCurPos (fileName, textView):
 	line, col = curpos.loadCurPos(fileName)
 	setCursorPos(textView, line, col)
@@ -551,7 +663,12 @@ def SelectFont (parent, old):
 	dialog.destroy()
 	return new
 
-defaultSettings = { 'font': None }
+defaultSettings = {
+	'font': None,
+	'liveCheckDelay': 300, # ms, debounce window of check as you type
+	'compileCacheDisk': True, # keep compile results cache also on disk
+	'curPosCapacity': curpos.CUR_POS_DB_LEN, # files to remember cursor position of
+}
 _settingsStoreName = 'settings'
 loadSettings = lambda: store.load(_settingsStoreName, defaultSettings)
 saveSettings = lambda settings: store.save(_settingsStoreName, settings)
@@ -559,7 +676,7 @@ saveSettings = lambda settings: store.save(_settingsStoreName, settings)
 def translateBuilder (builder):
 	for obj in builder.get_objects():
 		# we do this because when we try to get properties, at least for SeparatorMenuItem, it disappears (there is an error somewhere in Gtk or PyGtk)
-		if type(obj) in (Gtk.Window, Gtk.MenuItem, Gtk.Label, Gtk.Button, Gtk.CheckButton):
+		if type(obj) in (Gtk.Window, Gtk.MenuItem, Gtk.Label, Gtk.Button, Gtk.CheckButton, Gtk.Expander):
 			if type(obj) is Gtk.Window:
 				label = obj.get_title()
 			else:
@@ -576,30 +693,6 @@ def translateBuilder (builder):
 		else:
 			print('translateBuilder: not match type:', type(obj))
 
-# return values: '\n' | '\r\n' | '\r'
-def detectLineSep (text: str):
-	ns = text.count('\n')
-	rs = text.count('\r')
-	rns = text.count('\r\n')
-	ns = ns - rns
-	rs = rs - rns
-	if Trace: print('ns:', ns, 'rns:', rns, 'rs:', rs)
-	if (rns > ns) and (rns > rs):
-		return '\r\n'
-	elif (rs > ns) and (rs > rns):
-		return '\r'
-	else:
-		return '\n'
-
-def splitToLines (text: str):
-	lines = []
-	for l in text.split('\r\n'):
-		for l1 in re.split( '[\r\n]', l ):
-			lines.append(l1)
-	return lines
-
-normalizeLineSep = lambda text, lineSep: lineSep.join( splitToLines(text) )
-
 # return values: None | matchStartIter, matchEndIter
 def doFind (start, textToFind: str, backward: bool, ignoreCase: bool):
 	assert type(textToFind) is str
@@ -837,18 +930,12 @@ class Application:
 
 ################################### Main window ###############################
 
-	# return values: False | True
-	def do_save (self, saveAs=False):
-		text = getText(self.srcTextView)
-
-		# normalize line sep and rstrip lines
-		text = self.mod['lineSep'].join( [ line.rstrip() for line in splitToLines(text) ] )
-
-		try:
-			encodedText, encoding = exportText(self.mod, text)
-		except Exception as e:
-			self.msg_set( tr('#Text convert error') + ': ' + exMsg(e) )
-			return
+	# text is encoded and written on the save thread (wait is False) | in place;
+	# return values: False | True (wait: saved, not wait: save started)
+	def do_save (self, saveAs=False, wait=False):
+		if self.loadSource is not None:
+			self.msg_set( tr('#File is loading') )
+			return False
 
 		if (self.mod['fileName'] is None) or saveAs:
 			fileName = SaveFile(self.mainWindow, self.mod['profile']['extensions'])
@@ -860,32 +947,91 @@ class Application:
 		else:
 			fileName = self.mod['fileName']
 
-		try:
-			util.writeFile( fileName, encodedText, sync=True )
-		except Exception as e:
-			self.msg_set( tr('#File write error') + ': ' + exMsg(e) )
-			return False
+		# snapshot
+		text = getText(self.srcTextView)
+		version = self.bufVersion
+		mod = self.mod
+		self.saveGeneration = self.saveGeneration + 1
+		generation = self.saveGeneration
+
+		# return values: (error msg | None, encoding)
+		def job ():
+			# compile of saved file may hold it renamed to backup: save after it
+			self.backupFree.wait()
+
+			# normalize line sep and rstrip lines
+			x = mod['lineSep'].join( [ line.rstrip() for line in splitToLines(text) ] )
+			try:
+				encodedText, encoding = exportText(mod, x)
+			except Exception as e:
+				return (tr('#Text convert error') + ': ' + exMsg(e), None)
+			try:
+				util.writeFileAtomic( fileName, encodedText, sync=True )
+			except Exception as e:
+				return (tr('#File write error') + ': ' + exMsg(e), None)
+			if encoding is not None:
+				curpos.saveFileEncoding(fileName, encoding, mod['lineSep'])
+			return (None, encoding)
+
+		if wait:
+			self.save_wait()
+			return self.save_done(generation, version, mod, fileName, job())
 		else:
-			self.srcTextView.get_buffer().set_modified(False)
+			save = (self.saver.submit(job), (generation, version, mod, fileName))
+			self.saves.append(save)
+			save[0].add_done_callback(lambda future: GObject.idle_add(self.save_finished, save))
+			return True
+
+	# called in main loop when started save finished (if not finished by save_wait)
+	def save_finished (self, save):
+		for i, x in enumerate(self.saves):
+			if x is save:
+				del self.saves[i]
+				future, args = save
+				self.save_done(*args, future.result())
+				break
+		return False
+
+	# called in main loop when save finished, return values: False (error) | True
+	def save_done (self, generation, version, mod, fileName, result):
+		msg, encoding = result
+		if msg is not None:
+			self.msg_set(msg)
+			return False
+		if Trace: print('saved:', fileName)
+		if generation == self.saveGeneration: # last save of current document
+			if version == self.bufVersion: # not changed since snapshot
+				self.srcTextView.get_buffer().set_modified(False)
 			# update also importEncoding
 			self.mod = {
 				'fileName': fileName,
-				'modified': False,
-				'profile': self.mod['profile'],
+				'modified': self.srcTextView.get_buffer().get_modified(),
+				'profile': mod['profile'],
 				'importEncoding': encoding,
-				'lineSep': self.mod['lineSep']
+				'lineSep': mod['lineSep']
 			}
 			self.modified_changed()
-			return True
+		return True
+
+	# wait for started saves and apply their results (self.mod etc.) at once
+	def save_wait (self):
+		while len(self.saves) > 0:
+			future, args = self.saves.pop(0)
+			self.save_done(*args, future.result())
 
 	# return values: False | True
 	def check_save (self):
+		if self.loadSource is not None: # loading file is not changed
+			return True
+
+		self.save_wait() # result of started saves decides
+
 		modified = self.srcTextView.get_buffer().get_modified()
 		if modified:
 			yesNoCancel = SaveRequest(self.mainWindow)
 			if Trace: print(yesNoCancel)
 			if yesNoCancel == 'YES':
-				return self.do_save()
+				return self.do_save(wait=True)
 			elif yesNoCancel == 'NO':
 				return True
 			elif yesNoCancel == 'CANCEL':
@@ -911,6 +1057,9 @@ class Application:
 		if prof is None:
 			prof = SelectProfile(self.mainWindow, profiles.profiles)
 		if prof is not None:
+			self.load_cancel()
+			self.compiler.cancel()
+
 			buffer = self.srcTextView.get_buffer()
 			setupBuffer(buffer, prof.get('lang'), prof.get('style'))
 			new = prof.get('empty')
@@ -940,11 +1089,14 @@ class Application:
 				if GTKSV:
 					buffer.end_not_undoable_action()
 			buffer.set_modified(False)
+			self.cancel_live_check()
+			self.marks_set(None, None)
 
 			lineSep = prof.get('lineSep', '\n')
 			assert lineSep in ('\n', '\r\n', '\r')
 			if Trace: print('lineSep:', repr(lineSep))
 
+			self.saveGeneration = self.saveGeneration + 1 # started saves are of previous document
 			self.mod = {
 				'fileName': fileName,
 				'modified': False,
@@ -977,12 +1129,22 @@ class Application:
 	def on_window1_destroy (self, widget, data=None):
 		if Trace: print('mainwin destroy')
 
+		self.load_cancel()
+		self.save_wait()
+		self.saver.shutdown()
+
+		self.compiler.cancel()
+		profiles.terminate()
+		self.compiler.wait()
+		self.msg_fill_cancel()
+
 		if self.mod['fileName'] is not None:
 			saveCurPos(self.mod['fileName'], self.srcTextView)
 
 		if self.settings['modified']:
 			del self.settings['modified']
 			saveSettings(self.settings)
+		store.flush()
 
 		self.findWindow.destroy()
 
@@ -995,13 +1157,25 @@ class Application:
 
 	def do_open (self, fileName, prof):
 		# assert not modified
+		self.load_cancel()
+
+		known = None # remembered encoding and line separator
+		if 'import' not in prof:
+			known = curpos.loadFileEncoding(fileName)
+			try:
+				size = os.path.getsize(fileName)
+			except OSError:
+				size = 0
+			if size >= LARGE_FILE_SIZE:
+				self.do_open_large(fileName, prof, known)
+				return
 
 		try:
 			encodedText = util.readFile(fileName)
 		except Exception as e:
 			self.msg_set( tr('#File read error') + ': ' + exMsg(e) )
 		else:
-			r = importText(prof, encodedText, self.mainWindow)
+			r = importText(prof, encodedText, self.mainWindow, None if known is None else known[0])
 			if r is None:
 				self.msg_set( tr('#Text convert error') )
 			elif r == 'CANCEL':
@@ -1009,6 +1183,8 @@ class Application:
 			else:
 				text, encoding, autoDetected = r
 
+				self.compiler.cancel()
+
 				buffer = self.srcTextView.get_buffer()
 				setupBuffer(buffer, prof.get('lang'), prof.get('style'))
 				if GTKSV:
@@ -1017,36 +1193,161 @@ class Application:
 				if GTKSV:
 					buffer.end_not_undoable_action()
 				buffer.set_modified(False)
+				self.cancel_live_check()
+				self.marks_set(None, None)
 
 				lineSep = prof.get('lineSep', None)
 				if lineSep is None:
-					lineSep = detectLineSep(text)
-				assert lineSep in ('\n', '\r\n', '\r')
-				if Trace: print('lineSep:', repr(lineSep))
-
-				self.mod = {
-					'fileName': fileName,
-					'modified': False,
-					'profile': prof,
-					'importEncoding': encoding,
-					'lineSep': lineSep
-				}
-				self.modified_changed()
-				if autoDetected:
-					msg = '%s: %s: %s' % (tr('#WARNING'), tr('#file encoding was detected automatically'), encoding)
-					self.msg_set(msg)
-				else:
-					self.msg_set('')
-
-				if prof.get('sharpComments', False):
-					self.miSharpComment.set_property('visible', True)
-					self.miSharpUnComment.set_property('visible', True)
-				else:
-					self.miSharpComment.set_property('visible', False)
-					self.miSharpUnComment.set_property('visible', False)
+					if (known is not None) and (encoding == known[0]):
+						lineSep = known[1]
+					else:
+						lineSep = detectLineSep(text)
 
+				self.opened(fileName, prof, encoding, lineSep, autoDetected)
 				restoreCurPos(fileName, self.srcTextView)
 
+	# large file: mapped, decoded by chunks and inserted into buffer in main loop;
+	# text is held only by buffer
+	def do_open_large (self, fileName, prof, known):
+		try:
+			with open(fileName, 'rb') as fh:
+				mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+		except Exception as e:
+			self.msg_set( tr('#File read error') + ': ' + exMsg(e) )
+			return
+
+		# encoding and line separator by head of file, complete lines
+		sample = mm[:LARGE_FILE_SAMPLE]
+		p = sample.rfind(b'\n')
+		if p >= 0:
+			sample = sample[:p + 1]
+		r = importText(prof, sample, self.mainWindow, None if known is None else known[0])
+		del sample
+		if r is None:
+			mm.close()
+			self.msg_set( tr('#Text convert error') )
+			return
+		elif r == 'CANCEL':
+			mm.close()
+			return
+		text, encoding, autoDetected = r
+		lineSep = prof.get('lineSep', None)
+		if lineSep is None:
+			if (known is not None) and (encoding == known[0]):
+				lineSep = known[1]
+			else:
+				lineSep = detectLineSep(text)
+		del text
+
+		self.compiler.cancel()
+
+		buffer = self.srcTextView.get_buffer()
+		setupBuffer(buffer, prof.get('lang'), prof.get('style'))
+		if GTKSV:
+			buffer.begin_not_undoable_action()
+			buffer.set_highlight_syntax(False)
+		buffer.set_text('')
+		self.cancel_live_check()
+		self.marks_set(None, None)
+		self.srcTextView.set_editable(False)
+		self.opened(fileName, prof, encoding, lineSep, autoDetected)
+
+		decoder = codecs.getincrementaldecoder(encoding)()
+		size = len(mm)
+		ctx = self.statusbar.get_context_id('load')
+		self.statusbar.push(ctx, tr('#Loading...'))
+		pos = 0
+		rest = '' # decoded text after the last line end, inserted with next chunk
+		replaced = False # decode error after head: invalid characters replaced
+
+		def finish ():
+			self.loadSource = None
+			self.loadFinish = None
+			mm.close()
+			self.statusbar.pop(ctx)
+			if GTKSV:
+				buffer.set_highlight_syntax(True)
+				buffer.end_not_undoable_action()
+			self.srcTextView.set_editable(True)
+			buffer.set_modified(False)
+
+		def step ():
+			nonlocal pos, rest, decoder, replaced
+			end = min(pos + LOAD_CHUNK, size)
+			final = end == size
+			state = decoder.getstate()
+			try:
+				text = decoder.decode(mm[pos:end], final)
+			except UnicodeError as e:
+				# encoding was chosen by head of file: keep loaded text, replace invalid characters
+				if Trace: print('decode error:', repr(e))
+				decoder = codecs.getincrementaldecoder(encoding)('replace')
+				decoder.setstate(state)
+				text = decoder.decode(mm[pos:end], final)
+				replaced = True
+			text = rest + text
+			# chunks are cut after line ends: '\r\n' is not split between inserts
+			if final:
+				rest = ''
+			else:
+				p = text.rfind('\n') + 1
+				if p == 0: # no line end
+					p = len(text) - 1 if text.endswith('\r') else len(text)
+				rest = text[p:]
+				text = text[:p]
+			buffer.insert(buffer.get_end_iter(), text)
+			del text
+			pos = end
+			if pos < size:
+				self.statusbar.pop(ctx)
+				self.statusbar.push(ctx, '%s %d%%' % (tr('#Loading...'), pos * 100 // size))
+				return True
+			finish()
+			if Trace: print('loaded:', fileName, size)
+			if replaced:
+				self.msg_set( '%s: %s: %s' % (tr('#WARNING'), tr('#invalid characters replaced'), encoding) )
+			restoreCurPos(fileName, self.srcTextView)
+			return False
+
+		self.loadFinish = finish
+		self.loadSource = GObject.idle_add(step)
+
+	# stop loading of large file, buffer keeps loaded part
+	def load_cancel (self):
+		if self.loadSource is not None:
+			if Trace: print('load cancelled')
+			GObject.source_remove(self.loadSource)
+			self.loadFinish()
+
+	# file read into buffer
+	def opened (self, fileName, prof, encoding, lineSep, autoDetected):
+		assert lineSep in ('\n', '\r\n', '\r')
+		if Trace: print('lineSep:', repr(lineSep))
+
+		self.saveGeneration = self.saveGeneration + 1 # started saves are of previous document
+		self.mod = {
+			'fileName': fileName,
+			'modified': False,
+			'profile': prof,
+			'importEncoding': encoding,
+			'lineSep': lineSep
+		}
+		self.modified_changed()
+		if encoding is not None:
+			curpos.saveFileEncoding(fileName, encoding, lineSep)
+		if autoDetected:
+			msg = '%s: %s: %s' % (tr('#WARNING'), tr('#file encoding was detected automatically'), encoding)
+			self.msg_set(msg)
+		else:
+			self.msg_set('')
+
+		if prof.get('sharpComments', False):
+			self.miSharpComment.set_property('visible', True)
+			self.miSharpUnComment.set_property('visible', True)
+		else:
+			self.miSharpComment.set_property('visible', False)
+			self.miSharpUnComment.set_property('visible', False)
+
 	def on_open (self, widget, data=None):
 		if Trace: print('open')
 		if self.check_save():
@@ -1106,30 +1407,286 @@ class Application:
 
 	def msg_set (self, text, errs=None, warns=None):
 		assert type(text) is str
-		self.msgTextView.get_buffer().set_text(text)
 
-		def addLinks (l, tag):
+		# raw output: loaded on demand
+		self.msgText = text
+		self.msgTextLoaded = False
+		if self.msgExpander.get_expanded():
+			self.msg_raw_load()
+
+		links = {} # msgLine -> severity, pos
+		for severity, l in ((MSG_WARNING, warns), (MSG_ERROR, errs)):
 			if l is not None:
 				for msgLine, pos in l:
-					it1 = msgBuf.get_iter_at_line(msgLine)
+					links[msgLine] = (severity, pos)
 
-					# skip spaces
-					#c = it1.get_char()
-					#while c in (' ', '\t'):
-					#	it1.forward_char()
-					#	c = it1.get_char()
+		self.msgStreaming = False
+		self.msg_fill_cancel()
+		self.msgStore.clear()
+		self.msg_fill_rows(self.msg_rows(self.msg_lines(text), links))
 
-					it2 = it1.copy()
-					it2.forward_to_line_end()
-					msgBuf.apply_tag(tag, it1, it2)
+	# append complete lines of text with links relative to text (partial result of compile),
+	# rows of list and its selection are kept
+	def msg_append (self, text, errs=None, warns=None):
+		assert type(text) is str
 
-					links[msgLine] = pos
+		self.msgText = self.msgText + text
+		if self.msgTextLoaded:
+			buffer = self.msgTextView.get_buffer()
+			buffer.insert(buffer.get_end_iter(), text)
 
 		links = {}
-		msgBuf = self.msgTextView.get_buffer()
-		addLinks(errs, self.msgErrTag)
-		addLinks(warns, self.msgWarnTag)
-		self.msgLinks = links
+		for severity, l in ((MSG_WARNING, warns), (MSG_ERROR, errs)):
+			if l is not None:
+				for msgLine, pos in l:
+					links[msgLine] = (severity, pos)
+
+		self.msg_fill_rows(self.msg_rows(self.msg_lines(text), links))
+
+	def msg_lines (self, text):
+		lines = text.split('\n')
+		if (len(lines) > 0) and (lines[-1] == ''):
+			del lines[-1]
+		return lines
+
+	# add rows now and in idle batches after rows being added
+	def msg_fill_rows (self, rows):
+		if self.msgFillSource is not None:
+			self.msgFillRows = itertools.chain(self.msgFillRows, rows)
+		else:
+			self.msgFillRows = rows
+			if self.msg_fill():
+				self.msgFillSource = GObject.idle_add(self.msg_fill)
+
+	# diagnostics list rows: text, severity, line, col, background
+	def msg_rows (self, lines, links):
+		for msgLine, text in enumerate(lines):
+			severity, pos = links.get(msgLine, (MSG_OTHER, (None, None)))
+			line, col = pos
+			yield (text, severity,
+				-1 if line is None else line, -1 if col is None else col,
+				msgColors[severity])
+
+	# add next batch of rows, return values: True (more rows) | False
+	def msg_fill (self):
+		append = self.msgStore.append
+		rows = self.msgFillRows
+		for i in range(MSG_FILL_BATCH):
+			row = next(rows, None)
+			if row is None:
+				self.msgFillSource = None
+				self.msgFillRows = None
+				return False
+			append(row)
+		return True
+
+	def msg_fill_cancel (self):
+		if self.msgFillSource is not None:
+			GObject.source_remove(self.msgFillSource)
+			self.msgFillSource = None
+		self.msgFillRows = None
+
+	def msg_raw_load (self):
+		if not self.msgTextLoaded:
+			self.msgTextView.get_buffer().set_text(self.msgText)
+			self.msgTextLoaded = True
+
+	def on_msg_raw_expanded (self, expander, param):
+		if expander.get_expanded():
+			self.msg_raw_load()
+
+	def msg_visible (self, model, it, data):
+		return self.msgShow[ model.get_value(it, 1) ]
+
+	def on_msg_filter_toggled (self, widget, data=None):
+		self.msgShow = {
+			MSG_ERROR: self.msgShowErrors.get_active(),
+			MSG_WARNING: self.msgShowWarnings.get_active(),
+			MSG_OTHER: self.msgShowOther.get_active(),
+		}
+		self.msgFilter.refilter()
+
+	def on_msg_row_activated (self, view, path, column):
+		model = view.get_model()
+		it = model.get_iter(path)
+		srcLine, srcCol = model.get_value(it, 2), model.get_value(it, 3)
+		if srcLine < 0:
+			return
+		if srcCol < 0:
+			srcCol = None
+
+		if Trace: print('link to pos:', srcLine, srcCol)
+
+		setCursorPos(self.srcTextView, srcLine, srcCol)
+
+		def srcTextViewGrabFocus ():
+			if Trace: print('idle src view grab focus')
+			self.srcTextView.grab_focus()
+			return False
+
+		GObject.idle_add(srcTextViewGrabFocus)
+
+	# inline diagnostics in source view: underline tags and line marks (GtkSource);
+	# only changed diagnostics are added or removed
+	def marks_set (self, errs, warns):
+		buffer = self.srcTextView.get_buffer()
+		lineCount = buffer.get_line_count()
+
+		# shown diagnostics, keys by current positions (marks follow text changes)
+		old = {}
+		for (severity, line, col), entry in self.srcMarks.items():
+			it = buffer.get_iter_at_mark(entry[0])
+			key = (severity, it.get_line(), None if col is None else it.get_line_offset())
+			if key in old:
+				self.marks_remove(buffer, entry)
+			else:
+				old[key] = entry
+
+		new = {} # key -> range
+		for severity, l in ((MSG_ERROR, errs), (MSG_WARNING, warns)):
+			if l is not None:
+				for msgLine, (line, col) in l:
+					if (line is not None) and (0 <= line < lineCount):
+						start, end = diagRange(buffer, line, col)
+						key = (severity, line, None if col is None else start.get_line_offset())
+						new[key] = (start.get_offset(), end.get_offset())
+
+		touched = set() # lines
+		for key in old.keys() - new.keys():
+			entry = old.pop(key)
+			touched.add(key[1])
+			self.marks_remove(buffer, entry)
+		for key in new.keys() - old.keys():
+			start, end = new[key]
+			start = buffer.get_iter_at_offset(start)
+			end = buffer.get_iter_at_offset(end)
+			if GTKSV:
+				sourceMark = buffer.create_source_mark(None, srcMarkCategories[key[0]], start)
+			else:
+				sourceMark = None
+			old[key] = (buffer.create_mark(None, start, True), buffer.create_mark(None, end, False), sourceMark)
+			touched.add(key[1])
+		self.srcMarks = old
+
+		# tags of touched lines: removed diagnostics may overlap with kept ones
+		if len(touched) > 0:
+			for line in touched:
+				start = buffer.get_iter_at_line(line)
+				end = start.copy()
+				end.forward_line()
+				for tag in self.srcTags.values():
+					buffer.remove_tag(tag, start, end)
+			for (severity, line, col), entry in old.items():
+				if line in touched:
+					buffer.apply_tag(self.srcTags[severity],
+						buffer.get_iter_at_mark(entry[0]), buffer.get_iter_at_mark(entry[1]))
+
+	# add diagnostics (partial result of compile) to shown ones
+	def marks_add (self, errs, warns):
+		buffer = self.srcTextView.get_buffer()
+		lineCount = buffer.get_line_count()
+		for severity, l in ((MSG_ERROR, errs), (MSG_WARNING, warns)):
+			if l is not None:
+				for msgLine, (line, col) in l:
+					if (line is not None) and (0 <= line < lineCount):
+						start, end = diagRange(buffer, line, col)
+						key = (severity, line, None if col is None else start.get_line_offset())
+						if key not in self.srcMarks:
+							if GTKSV:
+								sourceMark = buffer.create_source_mark(None, srcMarkCategories[severity], start)
+							else:
+								sourceMark = None
+							self.srcMarks[key] = (buffer.create_mark(None, start, True), buffer.create_mark(None, end, False), sourceMark)
+							buffer.apply_tag(self.srcTags[severity], start, end)
+
+	def marks_remove (self, buffer, entry):
+		startMark, endMark, sourceMark = entry
+		buffer.delete_mark(startMark)
+		buffer.delete_mark(endMark)
+		if sourceMark is not None:
+			buffer.delete_mark(sourceMark)
+
+	# links of compiled buffer source = (version, text) mapped to current buffer
+	def compile_links (self, source, errs, warns):
+		version, text = source
+		if version == self.bufVersion:
+			return errs, warns
+		oldLines = text.split('\n')
+		newLines = getText(self.srcTextView).split('\n')
+		if Trace: print('compile result of changed buffer:', version, self.bufVersion)
+		return textops.shiftLinks(errs, oldLines, newLines), textops.shiftLinks(warns, oldLines, newLines)
+
+	# called in main loop when compile job finished
+	def compile_done (self, generation, source, result, exc):
+		if self.compiler.isCurrent(generation):
+			if exc is not None:
+				self.msg_set( tr('#Compile error') + ': ' + exMsg(exc) )
+			else:
+				msg, errs, warns = result
+				assert msg is not None
+				errs, warns = self.compile_links(source, errs, warns)
+				self.msg_set(msg, errs=errs, warns=warns)
+				self.marks_set(errs, warns)
+				self.compile_jump(errs)
+		elif Trace:
+			print('compile result dropped:', generation)
+		return False
+
+	# called in main loop with partial result of running compile job (new lines of output),
+	# whole result is shown by compile_done
+	def compile_progress (self, generation, source, result):
+		if self.compiler.isCurrent(generation):
+			msg, errs, warns = result
+			errs, warns = self.compile_links(source, errs, warns)
+			if self.msgStreaming:
+				self.msg_append(msg, errs=errs, warns=warns)
+				self.marks_add(errs, warns)
+			else: # first part: replaces 'Compiling...' and marks of previous compile
+				self.msg_set(msg, errs=errs, warns=warns)
+				self.msgStreaming = True
+				self.marks_set(errs, warns)
+			self.compile_jump(errs)
+		return False
+
+	# to first error, once per compile
+	def compile_jump (self, errs):
+		if (not self.compileJumped) and (errs is not None) and (len(errs) > 0):
+			msgLine, pos = errs[0]
+			line, col = pos
+			setCursorPos(self.srcTextView, line, col)
+			self.compileJumped = True
+
+	def cancel_live_check (self):
+		if self.liveCheckTimer is not None:
+			GObject.source_remove(self.liveCheckTimer)
+			self.liveCheckTimer = None
+
+	def on_buffer_changed (self, buffer):
+		self.bufVersion = self.bufVersion + 1
+		self.cancel_live_check()
+		if self.mod['profile'].get('liveCheck', False) and (self.loadSource is None):
+			delay = self.settings.get('liveCheckDelay', defaultSettings['liveCheckDelay'])
+			self.liveCheckTimer = GObject.timeout_add(delay, self.on_live_check_timeout)
+
+	def on_live_check_timeout (self):
+		self.liveCheckTimer = None
+		if self.mod['profile'].get('liveCheck', False):
+			doLiveCheck(self)
+		return False
+
+	# called in main loop when live check job finished
+	def live_check_done (self, generation, version, result, exc):
+		if self.compiler.isCurrent(generation) and (version == self.bufVersion):
+			if exc is not None:
+				self.msg_set( tr('#Compile error') + ': ' + exMsg(exc) )
+			else:
+				msg, errs, warns = result
+				assert msg is not None
+				self.msg_set(msg, errs=errs, warns=warns)
+				self.marks_set(errs, warns)
+		elif Trace:
+			print('live check result dropped:', generation, version)
+		return False
 
 	def on_menuitem10_activate (self, widget, data=None):
 		if Trace: print('select font')
@@ -1150,29 +1707,6 @@ class Application:
 				startIt, endIt = bounds
 				buffer.select_range(startIt, startIt)
 
-	def msg_link_tag_event (self, tag, widget, event, iter):
-		if event.type == Gdk.EventType.BUTTON_RELEASE:
-			if Trace: print('msg link tag event btn release')
-
-			msgLine = iter.get_line()
-			if Trace: print('msg line:', msgLine)
-
-			pos = self.msgLinks.get(msgLine, None)
-			srcLine, srcCol = pos
-
-			if Trace: print('link to pos:', pos)
-
-			setCursorPos(self.srcTextView, srcLine, srcCol)
-
-			def srcTextViewGrabFocus ():
-				if Trace: print('idle src view grab focus')
-				self.srcTextView.grab_focus()
-				return False
-
-			GObject.idle_add(srcTextViewGrabFocus)
-
-		return False
-
 	def setMainWindowSize (self):
 		s = self.mainWindow.get_screen()
 		d = s.get_display()
@@ -1195,11 +1729,29 @@ class Application:
 			print("WARNING: can not get primary monitor")
 
 	def __init__ (self, par):
-		self.msgLinks = None
+		self.msgFillSource = None
+		self.msgFillRows = None # rows to add by msg_fill
+		self.msgStreaming = False # list shows partial result of compile, see compile_progress
+		self.compileJumped = False # compile job jumped to first error
+		self.compiler = worker.Worker('compile')
+		self.saver = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='save') # in order of do_save
+		self.backupFree = threading.Event() # not set while compile job holds saved file renamed to backup
+		self.backupFree.set()
+		self.saves = [] # started saves: (future, args of save_done), see save_finished
+		self.saveGeneration = 0 # of last save, see save_done
+		self.loadSource = None # loading of large file, see do_open_large
+		self.loadFinish = None
 
 		self.settings = loadSettings()
 		self.settings['modified'] = False
 
+		curpos.setCapacity( self.settings.get('curPosCapacity', defaultSettings['curPosCapacity']) )
+
+		if self.settings.get('compileCacheDisk', defaultSettings['compileCacheDisk']):
+			self.compileCache = cache.CompileCache()
+		else:
+			self.compileCache = cache.CompileCache(diskDir=None)
+
 		builder = Gtk.Builder()
 		# gladeFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'ide-gtk3.ui')
 		gladeFile = os.path.join( util.dataDir(), 'ide-gtk3.ui' )
@@ -1213,6 +1765,7 @@ class Application:
 
 		self.miSharpComment = builder.get_object('menuitem5')
 		self.miSharpUnComment = builder.get_object('menuitem6')
+		self.statusbar = builder.get_object('statusbar1')
 
 		if GTKSV:
 			view = NewSrcTextSView()
@@ -1226,22 +1779,47 @@ class Application:
 		view.show()
 		self.srcTextView = view
 
+		buffer = view.get_buffer()
+		self.srcTags = {
+			MSG_ERROR: buffer.create_tag(underline=Pango.Underline.ERROR),
+			MSG_WARNING: buffer.create_tag(underline=Pango.Underline.ERROR, underline_rgba=Gdk.RGBA(1.0, 0.65, 0.0, 1.0)),
+		}
+		self.srcMarks = {} # (severity, line, col) -> start mark, end mark, source mark | None
+		if GTKSV:
+			for severity, icon in ((MSG_ERROR, 'dialog-error'), (MSG_WARNING, 'dialog-warning')):
+				attrs = GtkSource.MarkAttributes()
+				attrs.set_icon_name(icon)
+				view.set_mark_attributes(srcMarkCategories[severity], attrs, 1)
+			view.set_show_line_marks(True)
+
+		self.bufVersion = 0 # incremented on every buffer change
+		self.liveCheckTimer = None
+
 		if self.settings['font'] is not None:
 			self.srcTextView.modify_font(Pango.FontDescription(self.settings['font']))
 
 		self.msgTextView = builder.get_object('textview2')
-#		color = self.mainWindow.get_visual().alloc_color(
-#			65535, 49152, 49152
-#		)
-		color = 'pink'
-		self.msgErrTag = self.msgTextView.get_buffer().create_tag(background=color)
-		self.msgErrTag.connect("event", self.msg_link_tag_event)
-#		color = self.mainWindow.get_colormap().alloc_color(
-#			65535, 65535, 32768
-#		)
-		color = 'yellow'
-		self.msgWarnTag = self.msgTextView.get_buffer().create_tag(background=color)
-		self.msgWarnTag.connect("event", self.msg_link_tag_event)
+		self.msgExpander = builder.get_object('expander1')
+		self.msgText = ''
+		self.msgTextLoaded = True
+
+		self.msgShowErrors = builder.get_object('checkbutton3')
+		self.msgShowWarnings = builder.get_object('checkbutton4')
+		self.msgShowOther = builder.get_object('checkbutton5')
+		self.msgShow = { MSG_ERROR: True, MSG_WARNING: True, MSG_OTHER: True }
+
+		# rows are rendered by view when visible
+		self.msgStore = Gtk.ListStore(str, int, int, int, str)
+		self.msgFilter = self.msgStore.filter_new()
+		self.msgFilter.set_visible_func(self.msg_visible)
+		msgView = builder.get_object('treeview1')
+		renderer = Gtk.CellRendererText()
+		column = Gtk.TreeViewColumn('', renderer, text=0, background=4)
+		column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+		column.set_expand(True)
+		msgView.append_column(column)
+		msgView.set_tooltip_column(0)
+		msgView.set_model(self.msgFilter)
 
 		self.findWindow = builder.get_object('window2')
 		self.findWindow.set_transient_for(self.mainWindow)
@@ -1257,6 +1835,7 @@ class Application:
 
 		prof = profiles.profiles[0]
 		self.do_new(prof=prof)
+		self.srcTextView.get_buffer().connect("changed", self.on_buffer_changed)
 		if par is None:
 			self.on_new(None)
 		else:
@@ -1274,19 +1853,11 @@ class Application:
 # False: can not lookup profile by extension
 # None: cancelled
 def getProf (parent, fileName):
-	if '.' in fileName:
-		ext = fileName.split('.')[-1:][0]
-		ps = []
-		for prof in profiles.profiles:
-			for ext1 in prof['extensions']:
-				if ext1 == ext:
-					ps.append(prof)
-		if len(ps) == 1:
-			return ps[0]
-		elif len(ps) > 0:
-			return SelectProfile(parent, ps)
-		else:
-			return False
+	ps = profiles.byExtension(fileName)
+	if len(ps) == 1:
+		return ps[0]
+	elif len(ps) > 0:
+		return SelectProfile(parent, ps)
 	else:
 		return False
 
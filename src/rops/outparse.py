@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# declarative parsing of compiler output:
+# every message kind of a compiler is described by a rule,
+# rules of a compiler are compiled once into one multiline pattern,
+# whole output is parsed in one pass (finditer)
+#
+
+import re, bisect, itertools
+
+ERROR, WARNING = 'error', 'warning'
+
+# line start offsets of text, build once and map many positions
+class LineIndex:
+
+	def __init__ (self, src: str):
+		# starts[i]: offset of line i; last item: offset after the virtual line end
+		self.starts = list( itertools.accumulate( (l + 1 for l in map(len, src.split('\n'))), initial=0 ) )
+
+	# position (character offset) -> (line, col), 0-based
+	# position just after the line end belongs to this line
+	def lineCol0 (self, pos: int):
+		starts = self.starts
+		line = bisect.bisect_left(starts, pos, 1) - 1
+		if line < len(starts) - 1:
+			return (line, pos - starts[line])
+		else:
+			return None
+
+class Rule:
+
+	# pattern: one message line without line end, must not match '\n'
+	#	(use [ \t] instead of \s, [^:\n] instead of [^:]);
+	# line, col: groups of source line and column, 1-based (col None: whole line);
+	# pos: group of source character position (instead of line and col), posBase: added to position;
+	# severity: ERROR | WARNING | (group, ((prefix, ERROR | WARNING | None), ...), default),
+	#	None: message is skipped;
+	# file: group of source file name, checked by isFile of parse
+	def __init__ (self, pattern: str, line=None, col=None, pos=None, posBase=0, severity=ERROR, file=None):
+		assert (line is None) != (pos is None)
+		self.pattern = pattern
+		self.groups = re.compile(pattern).groups
+		self.line = line
+		self.col = col
+		self.pos = pos
+		self.posBase = posBase
+		self.severity = severity
+		self.file = file
+
+	def getSeverity (self, m, base: int):
+		if type(self.severity) is tuple:
+			group, prefixes, default = self.severity
+			x = m.group(base + group)
+			for prefix, severity in prefixes:
+				if x.startswith(prefix):
+					return severity
+			return default
+		else:
+			return self.severity
+
+class Spec:
+
+	# rules: first matching rule wins;
+	# stream: 'e' (stderr) | 'o' (stdout), messages shown as stderr + stdout
+	def __init__ (self, rules, stream: str = 'o'):
+		assert stream in ('e', 'o')
+		self.rules = tuple(rules)
+		self.stream = stream
+		alternatives = []
+		self.bases = {} # group of rule -> (rule, group offset of rule groups)
+		group = 1
+		for rule in self.rules:
+			alternatives.append( '(' + rule.pattern + ')' )
+			self.bases[group] = (rule, group)
+			group = group + 1 + rule.groups
+		self.pattern = re.compile( '^(?:' + '|'.join(alternatives) + ')$', re.M )
+
+# parse compiler output, return values: errs, warns (lists of links (msgLine, (line, col)), 0-based)
+# text: source, required by rules with pos;
+# isFile: function (fileName) -> bool, required by rules with file
+def parse (spec: Spec, e: str, o: str, text: str | None = None, isFile=None):
+	if spec.stream == 'o':
+		s = o
+		i = e.count('\n')
+	else:
+		s = e
+		i = 0
+
+	errs = []
+	warns = []
+	links = { ERROR: errs, WARNING: warns }
+	lineIndex = None
+	bases = spec.bases
+	count = s.count
+	last = 0
+	for m in spec.pattern.finditer(s):
+		start = m.start()
+		i = i + count('\n', last, start)
+		last = start
+
+		rule, base = bases[m.lastindex]
+		if (rule.file is not None) and not isFile(m.group(base + rule.file)):
+			continue
+		severity = rule.getSeverity(m, base)
+		if severity is None:
+			continue
+		if rule.pos is not None:
+			if lineIndex is None:
+				lineIndex = LineIndex(text)
+			pos = lineIndex.lineCol0(int(m.group(base + rule.pos)) + rule.posBase)
+			if pos is None:
+				continue
+		else:
+			line = int(m.group(base + rule.line)) - 1
+			if rule.col is not None:
+				pos = (line, int(m.group(base + rule.col)) - 1)
+			else:
+				pos = (line, None)
+		links[severity].append( (i, pos) )
+	return errs, warns
@@ -3,16 +3,14 @@
 # Alexander Shiryaev, 2010-2017, 2021, 2024
 #
 
-import re, subprocess, os, sys, locale, tempfile, time, errno, traceback
-from . import util, winenc
+import re, subprocess, os, sys, locale, time, errno, traceback, threading, selectors, collections
+from . import util, winenc, warmhost, scratch, outparse
+from .outparse import Rule, LineIndex, ERROR, WARNING
 from .translate import tr
 from . import cocodrivers
 
 mswindows = (sys.platform == 'win32')
 
-if not mswindows:
-	import fcntl # for cmdPollOnly
-
 Trace = True
 
 def sameFile (fn1, fn2):
@@ -21,6 +19,52 @@ def sameFile (fn1, fn2):
 	else:
 		return os.path.samefile(fn1, fn2)
 
+# running compiler processes, see terminate
+_procs = set()
+_procsLock = threading.Lock()
+
+# commands run by this thread since runsReset, see check:
+# [ (args, returncode | None (not waited) | exception (not started)), ... ]
+_runs = threading.local()
+
+def runsReset ():
+	_runs.items = []
+
+def runs ():
+	return getattr(_runs, 'items', [])
+
+def _runDone (args, x):
+	items = getattr(_runs, 'items', None)
+	if items is not None:
+		items.append( (args, x) )
+
+def popen (args, **kw):
+	try:
+		p = subprocess.Popen(args, **kw)
+	except Exception as e:
+		_runDone(args, e)
+		raise
+	with _procsLock:
+		_procs.add(p)
+	return p
+
+def released (p):
+	with _procsLock:
+		_procs.discard(p)
+	_runDone(p.args, p.returncode)
+
+# kill running compiler processes (their results are not needed anymore)
+def terminate ():
+	with _procsLock:
+		procs = list(_procs)
+	for p in procs:
+		if p.poll() is None:
+			if Trace: print('terminate', p.args)
+			try:
+				p.kill()
+			except OSError:
+				pass
+
 def cmd (args, input=None):
 	if Trace: print('cmd', args)
 
@@ -30,87 +74,132 @@ def cmd (args, input=None):
 		inp = subprocess.PIPE
 
 	close_fds = not mswindows
-	p = subprocess.Popen(args, bufsize=8192, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=inp, close_fds=close_fds)
-
-	if input is not None:
-		p.stdin.write(input)
+	p = popen(args, bufsize=8192, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=inp, close_fds=close_fds)
+	try:
+		if input is not None:
+			p.stdin.write(input)
 
-	o, e = p.communicate()
+		o, e = p.communicate()
+	finally:
+		released(p)
 
 	return e, o
 
-# not mswindows
-def setnonblock (fd):
-	flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-	flags = flags | os.O_NONBLOCK
-	fcntl.fcntl(fd, fcntl.F_SETFL, flags)
+STREAM_INTERVAL = 0.25 # s, min interval between progress calls of cmdStream
+
+# as cmd, output is read as it arrives:
+# progress(e, o) is called with output after the previous call (not more often than STREAM_INTERVAL)
+def cmdStream (args, progress=None):
+	if (progress is None) or mswindows: # no select on pipes
+		return cmd(args)
+
+	if Trace: print('cmdStream', args)
+
+	p = popen(args, bufsize=8192, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, close_fds=True)
+	try:
+		chunks = { p.stderr: [], p.stdout: [] }
+		reported = { p.stderr: 0, p.stdout: 0 } # number of chunks passed to progress
+		last = time.monotonic()
+		new = False # output after last progress call
+		with selectors.DefaultSelector() as sel:
+			sel.register(p.stderr, selectors.EVENT_READ)
+			sel.register(p.stdout, selectors.EVENT_READ)
+			while sel.get_map():
+				t = None
+				if new:
+					t = max(last + STREAM_INTERVAL - time.monotonic(), 0)
+				for key, events in sel.select(t):
+					x = os.read(key.fd, 65536)
+					if x == b'':
+						sel.unregister(key.fileobj)
+					else:
+						chunks[key.fileobj].append(x)
+						new = True
+				if new and (time.monotonic() - last >= STREAM_INTERVAL) and sel.get_map():
+					x = []
+					for f in (p.stderr, p.stdout):
+						x.append( b''.join(chunks[f][reported[f]:]) )
+						reported[f] = len(chunks[f])
+					progress(*x)
+					last = time.monotonic()
+					new = False
+		p.wait()
+		p.stderr.close()
+		p.stdout.close()
+	finally:
+		released(p)
+
+	return b''.join(chunks[p.stderr]), b''.join(chunks[p.stdout])
+
+# cmdStream progress for profile compile progress:
+# partial result (msg, errs, warns) of lines of output completed after the previous call,
+# msg lines of links are relative to this msg; only new lines are parsed
+def partialResult (progress, spec: outparse.Spec, encoding: str, **kw):
+	if progress is None:
+		return None
+
+	tails = [ b'', b'' ] # incomplete last lines of stderr, stdout
+
+	def partial (e: bytes, o: bytes):
+		x = []
+		for i, data in enumerate((e, o)):
+			if tails[i] != b'':
+				data = tails[i] + data
+			n = data.rfind(b'\n') + 1
+			tails[i] = data[n:]
+			x.append( data[:n].decode(encoding, 'replace') )
+		e, o = x
+		if (e == '') and (o == ''):
+			return
+		errs, warns = outparse.parse(spec, e, o, **kw)
+		progress( (e + o, errs, warns) )
+
+	return partial
+
+POLL_ONLY_TIMEOUT = 10.0 # s
 
 # не ждём завершения дочерних процессов (wine)
 # not mswindows
-def cmdPollOnly (args):
+def cmdPollOnly (args, timeout=POLL_ONLY_TIMEOUT):
 	if Trace: print('cmdPollOnly', args)
 
 	close_fds = not mswindows
-	p = subprocess.Popen(args, bufsize=8192, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=close_fds)
-
-	setnonblock(p.stderr)
-	setnonblock(p.stdout)
-
-	t0 = time.time()
-	pollDone = False
-	e = b''
-	eDone = False
-	o = b''
-	oDone = False
-	while (not (pollDone and eDone and oDone)) and (time.time() - t0 < 10.0):
-		if not pollDone:
-			x = p.poll()
-			pollDone = x is not None
-			if pollDone:
-				if Trace: print('poll done')
-		if not eDone:
-			try:
-				x = p.stderr.read()
-			except IOError as ex:
-				if ex.strerror == 'Resource temporarily unavailable':
-					pass
-				elif ex.errno == errno.EAGAIN: # 'Resource temporarily unavailable'
-					pass
-				else:
-					print('e IOerror', repr(ex))
-			else:
-				if x is None:
-					pass
-				elif x == b'':
-					eDone = True
-					if Trace: print('stderr done')
-				else:
-					e = e + x
-		if not oDone:
+	p = popen(args, bufsize=8192, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=close_fds)
+	try:
+		deadline = time.monotonic() + timeout
+		chunks = { p.stderr: [], p.stdout: [] }
+		with selectors.DefaultSelector() as sel:
+			sel.register(p.stderr, selectors.EVENT_READ)
+			sel.register(p.stdout, selectors.EVENT_READ)
+			while sel.get_map():
+				t = deadline - time.monotonic()
+				if t <= 0:
+					break
+				for key, events in sel.select(t):
+					x = os.read(key.fd, 65536)
+					if x == b'':
+						sel.unregister(key.fileobj)
+						if Trace: print('stderr done' if key.fileobj is p.stderr else 'stdout done')
+					else:
+						chunks[key.fileobj].append(x)
+			done = not sel.get_map()
+		if done:
+			# only the process itself, not its children (wineserver)
 			try:
-				x = p.stdout.read()
-			except IOError as ex:
-				if ex.strerror == 'Resource temporarily unavailable':
-					pass
-				elif ex.errno == errno.EAGAIN: # 'Resource temporarily unavailable'
-					pass
-				else:
-					print('o IOError', repr(ex))
+				p.wait(max(deadline - time.monotonic(), 0))
+			except subprocess.TimeoutExpired:
+				done = False
 			else:
-				if x is None:
-					pass
-				elif x == b'':
-					oDone = True
-					if Trace: print('stdout done')
-				else:
-					o = o + x
-	if not (pollDone and eDone and oDone):
-		print('Timeout')
+				if Trace: print('poll done')
+		if not done:
+			print('Timeout')
 
-	p.stderr.close()
-	p.stdout.close()
+		p.stderr.close()
+		p.stdout.close()
+	finally:
+		released(p)
 
-	return e, o
+	return b''.join(chunks[p.stderr]), b''.join(chunks[p.stdout])
 
 # exMsg = lambda e: str(e)
 exMsg = lambda e: ''.join(traceback.format_exception(e))
@@ -118,23 +207,21 @@ exMsg = lambda e: ''.join(traceback.format_exception(e))
 _pMod = re.compile('^\s*MODULE\s+([a-zA-Z][a-zA-Z0-9]*)\s*;')
 _poo2cMod = re.compile('^\s*MODULE\s+([a-zA-Z][a-zA-Z0-9]*)\s*(?:\[[^\]]+\]\s*)?;')
 
-_pcLineCol = re.compile('^(?:[^:]+):([1-9][0-9]*):([1-9][0-9]*): ([^\n]+)\n')
-_pcLine = re.compile('^(?:[^:]+):([1-9][0-9]*): ([^\n]+)\n')
+# "file:line:col: message", "file:line: message"
+_cLineCol = '(?:[^:\n]+):([1-9][0-9]*):([1-9][0-9]*): ([^\n]+)'
+_cLine = '(?:[^:\n]+):([1-9][0-9]*): ([^\n]+)'
 
 _pPas = re.compile('^\s*(?:program|unit|library)\s+([a-zA-Z][a-zA-Z0-9]*)\s*;', re.I)
 
 # "    pos    20  err 41  END missing"
 # "  pos 14167  warning 307  no ELSE symbol after CASE statement sequence may lead to trap  24124 chars."
-_pVocPos = re.compile("^\s*pos\s+([0-9]+)\s+(err|warning)\s+([0-9]+)\s+([^\n]+)\n")
+_vocOut = outparse.Spec( (
+	Rule('[ \t]*pos[ \t]+([0-9]+)[ \t]+(err|warning)[ \t]+([0-9]+)[ \t]+([^\n]+)', pos=1, posBase=1,
+		severity=(2, (('err', ERROR), ('warning', WARNING)), None)),
+) )
 
 def posToLineCol0 (src, pos):
-	line = 0
-	for l in map(len, src.split('\n')): # XXX: split
-		if pos > l + 1:
-			pos = pos - l - 1
-			line = line + 1
-		else:
-			return (line, pos)
+	return LineIndex(src).lineCol0(pos)
 
 def vocCompile (flag, text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
@@ -143,19 +230,12 @@ def vocCompile (flag, text: str, encodedText: bytes, encoding: str, fileName: st
 
 	xCmd = 'voc'
 
-	fd, name = tempfile.mkstemp()
 	try:
-		try:
-			try:
-				os.write(fd, encodedText)
-			except Exception as e:
-				msg = tr('#File write error') + ': ' + exMsg(e)
-				return (msg, None, None)
-		finally:
-			try:
-				os.close(fd)
-			except:
-				pass
+		name = scratch.writeTemp(encodedText)
+	except Exception as e:
+		msg = tr('#File write error') + ': ' + exMsg(e)
+		return (msg, None, None)
+	try:
 		try:
 			if mswindows:
 				e, o = cmd([xCmd, "-f", flag, name])
@@ -165,38 +245,22 @@ def vocCompile (flag, text: str, encodedText: bytes, encoding: str, fileName: st
 			msg = xCmd + ': ' + exMsg(e)
 			return (msg, None, None)
 	finally:
-		try:
-			os.remove(name)
-		except:
-			pass
+		scratch.remove(name)
 
 	e = e.decode(encoding)
 	o = o.decode(encoding)
 	msg = e + o
 
-	eLines = e.count('\n')
-	errs = []
-	warns = []
-	i = eLines
-	for l in o.split('\n'):
-		r = _pVocPos.match(l + '\n')
-		if r is not None:
-			line, col = posToLineCol0(text, int(r.group(1)) + 1)
-			error = r.group(4)
-			pos = (line, col)
-			link = (i, pos)
-			if r.group(2) == 'err':
-				errs.append(link)
-			elif r.group(2) == 'warning':
-				warns.append(link)
-			else:
-				assert False
-		i = i + 1
+	errs, warns = outparse.parse(_vocOut, e, o, text=text)
 	return (msg, errs, warns)
 
 vocO2Compile = lambda text, encodedText, encoding, fileName: vocCompile('-O2', text, encodedText, encoding, fileName)
 vocOCCompile = lambda text, encodedText, encoding, fileName: vocCompile('-OC', text, encodedText, encoding, fileName)
 
+_oo2cOut = outparse.Spec( (
+	Rule(_cLineCol, line=1, col=2, severity=(3, (('Warning: ', WARNING),), ERROR)),
+) )
+
 def oo2cCompile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
 	assert type(encodedText) is bytes
@@ -215,51 +279,25 @@ def oo2cCompile (text: str, encodedText: bytes, encoding: str, fileName: str | N
 	if r is not None:
 		modName = r.group(1)
 
-		fd, name = tempfile.mkstemp(prefix=modName + '.')
 		try:
-			try:
-				try:
-					os.write(fd, encodedText.replace(b'\t', b' '))
-				except Exception as e:
-					msg = tr('#File write error') + ': ' + exMsg(e)
-					return (msg, None, None)
-			finally:
-				try:
-					os.close(fd)
-				except:
-					pass
+			name = scratch.writeTemp(encodedText.replace(b'\t', b' '), prefix=modName + '.')
+		except Exception as e:
+			msg = tr('#File write error') + ': ' + exMsg(e)
+			return (msg, None, None)
+		try:
 			try:
 				e, o = cmd([xCmd, name])
 			except Exception as e:
 				msg = xCmd + ': ' + exMsg(e)
 				return (msg, None, None)
 		finally:
-			try:
-				os.remove(name)
-			except:
-				pass
+			scratch.remove(name)
 
 		e = e.decode(encoding)
 		o = o.decode(encoding)
 		msg = e + o
 
-		eLines = e.count('\n')
-		errs = []
-		warns = []
-		i = eLines
-		for l in o.split('\n'):
-			r = _pcLineCol.match(l + '\n')
-			if r is not None:
-				line = int(r.group(1)) - 1
-				col = int(r.group(2)) - 1
-				pos = (line, col)
-				m = r.group(3)
-				link = (i, pos)
-				if m.startswith('Warning: '):
-					warns.append(link)
-				else:
-					errs.append(link)
-			i = i + 1
+		errs, warns = outparse.parse(_oo2cOut, e, o)
 		return (msg, errs, warns)
 
 	else:
@@ -267,7 +305,9 @@ def oo2cCompile (text: str, encodedText: bytes, encoding: str, fileName: str | N
 		return (msg, None, None)
 
 
-_dev0Pos = re.compile("^  pos =  ([0-9]+), error = '([^']+)'$")
+_dev0Out = outparse.Spec( (
+	Rule("  pos =  ([0-9]+), error = '([^'\n]+)'", pos=1),
+) )
 
 def dev0Compile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
@@ -276,52 +316,31 @@ def dev0Compile (text: str, encodedText: bytes, encoding: str, fileName: str | N
 
 	xCmd = 'blackbox'
 
-	fd, name = tempfile.mkstemp()
 	try:
-		try:
-			try:
-				os.write(fd, encodedText)
-			except Exception as e:
-				msg = tr('#File write error') + ': ' + exMsg(e)
-				return (msg, None, None)
-		finally:
-			try:
-				os.close(fd)
-			except:
-				pass
+		name = scratch.writeTemp(encodedText)
+	except Exception as e:
+		msg = tr('#File write error') + ': ' + exMsg(e)
+		return (msg, None, None)
+	try:
 		try:
 			e, o = cmd([xCmd], "ConsCompiler.Compile('%s', '%s')\n" % (os.path.dirname(name), os.path.basename(name),))
 		except Exception as e:
 			msg = xCmd + ': ' + exMsg(e)
 			return (msg, None, None)
 	finally:
-		try:
-			os.remove(name)
-		except:
-			pass
+		scratch.remove(name)
 
 	e = e.decode(encoding)
 	o = o.decode(encoding)
 	msg = e + o
 
-	eLines = e.count('\n')
-	errs = []
-	warns = []
-	i = eLines
-	for l in o.split('\n'):
-		r = _dev0Pos.match(l)
-		if r is not None:
-			line, col = posToLineCol0(text, int(r.group(1)))
-			error = r.group(2)
-			pos = (line, col)
-			link = (i, pos)
-			errs.append(link)
-		i = i + 1
+	errs, warns = outparse.parse(_dev0Out, e, o, text=text)
 	return (msg, errs, warns)
 
 # not mswindows
 def winePath (fileName: str):
 	args = ["winepath", "-w", fileName]
+	warmhost.wine.ensure()
 	try:
 		e, o = cmdPollOnly(args)
 	except Exception as e:
@@ -343,7 +362,10 @@ def dcc32FilterStdout (o: bytes):
 				lastL = l1
 	return b'\n'.join(r)
 
-_pdcc32Line = re.compile('^([^\(]+)\(([0-9]+)\) ([^\n]+)\n')
+_dcc32Out = outparse.Spec( (
+	Rule('([^(\n]+)\(([0-9]+)\) ([^\n]+)', line=2, file=1,
+		severity=(3, (('Error:', ERROR), ('Fatal:', ERROR)), WARNING)),
+) )
 
 def dcc32Compile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
@@ -387,6 +409,7 @@ def dcc32Compile (text: str, encodedText: bytes, encoding: str, fileName: str |
 							return (s, None, None)
 					else:
 						s = baseName
+					warmhost.wine.ensure()
 					try:
 						e, o = cmdPollOnly(["wine", "dcc32", "-R+", s])
 					except Exception as e:
@@ -399,22 +422,7 @@ def dcc32Compile (text: str, encodedText: bytes, encoding: str, fileName: str |
 				o = o.decode(encoding)
 				msg = e + o
 
-				eLines = e.count('\n')
-				errs = []
-				warns = []
-				i = eLines
-				for l in o.split('\n'):
-					r = _pdcc32Line.match(l + '\n')
-					if (r is not None) and (r.group(1) == baseName):
-						line = int(r.group(2)) - 1
-						pos = (line, None)
-						link = (i, pos)
-						m = r.group(3)
-						if m.startswith('Error:') or m.startswith('Fatal:'):
-							errs.append(link)
-						else:
-							warns.append(link)
-					i = i + 1
+				errs, warns = outparse.parse(_dcc32Out, e, o, isFile=lambda x: x == baseName)
 				return (msg, errs, warns)
 			finally:
 				try:
@@ -428,7 +436,10 @@ def dcc32Compile (text: str, encodedText: bytes, encoding: str, fileName: str |
 		msg = "'program ident;' or 'unit ident;' or 'library ident;' expected"
 		return (msg, None, None)
 
-_pfpcLine = re.compile('^([^\(]+)\(([0-9]+),([0-9]+)\) ([^\n]+)\n')
+_fpcOut = outparse.Spec( (
+	Rule('([^(\n]+)\(([0-9]+),([0-9]+)\) ([^\n]+)', line=2, col=3, file=1,
+		severity=(4, (('Error:', ERROR), ('Fatal:', ERROR)), WARNING)),
+) )
 
 def fpcCompile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
@@ -470,23 +481,7 @@ def fpcCompile (text: str, encodedText: bytes, encoding: str, fileName: str | No
 				o = o.decode(encoding)
 				msg = e + o
 
-				eLines = e.count('\n')
-				errs = []
-				warns = []
-				i = eLines
-				for l in o.split('\n'):
-					r = _pfpcLine.match(l + '\n')
-					if (r is not None) and (r.group(1) == baseName):
-						line = int(r.group(2)) - 1
-						col = int(r.group(3)) - 1
-						pos = (line, col)
-						link = (i, pos)
-						m = r.group(4)
-						if m.startswith('Error:') or m.startswith('Fatal:'):
-							errs.append(link)
-						else:
-							warns.append(link)
-					i = i + 1
+				errs, warns = outparse.parse(_fpcOut, e, o, isFile=lambda x: x == baseName)
 				return (msg, errs, warns)
 			finally:
 				try:
@@ -567,7 +562,10 @@ def gpcpCompile (text:str, encodedText: bytes, encoding: str, fileName: str | No
 		msg = "'MODULE Ident;' expected"
 		return (msg, None, None)
 
-_paLineCol = re.compile('^ *([0-9]+) +([0-9]+) *(Error|Warning): *([^\n]+)\n')
+_astrobeOut = outparse.Spec( (
+	Rule(' *([0-9]+) +([0-9]+) *(Error|Warning): *([^\n]+)', line=1, col=2,
+		severity=(3, (('Warning', WARNING),), ERROR)),
+) )
 
 def astrobeCompile (text: str, encodedText: bytes, encoding: str, fileName: str | None, astrobe: int):
 	assert type(text) is str
@@ -607,7 +605,6 @@ def astrobeCompile (text: str, encodedText: bytes, encoding: str, fileName: str
 				except Exception as e:
 					msg = tr('#File write error') + ': ' + exMsg(e)
 					return (msg, None, None)
-				isMono = False
 				if mswindows:
 					exe = os.path.join( os.getenv('ProgramFiles'), astrobeDir, 'AstrobeCompile.exe' )
 					try:
@@ -629,6 +626,7 @@ def astrobeCompile (text: str, encodedText: bytes, encoding: str, fileName: str
 								return (s, None, None)
 						else:
 							s = baseName
+						warmhost.wine.ensure()
 						try:
 							if astrobe in (1, 2): # M3 or M4
 								e, o = cmdPollOnly(["wine", "C:\\Program Files\\%s\\AstrobeCompile.exe" % (astrobeDir,), 'config.ini', s])
@@ -646,14 +644,15 @@ def astrobeCompile (text: str, encodedText: bytes, encoding: str, fileName: str
 					else:
 						tryMono = True
 					if tryMono:
+						exe = os.path.join(os.getenv('HOME'), "install", astrobeDir, "AstrobeCompile.exe")
+						warmhost.monoAot(exe)
 						try:
 							if astrobe in (1, 2): # M3 or M4
-								e, o = cmdPollOnly(["env", "MONO_IOMAP=all", "mono", os.path.join(os.getenv('HOME'), "install", astrobeDir, "AstrobeCompile.exe"), 'config.ini', fName])
+								e, o = cmdPollOnly(["env", "MONO_IOMAP=all", "mono", exe, 'config.ini', fName])
 							elif astrobe == 0: # LPC2000
-								e, o = cmdPollOnly(["env", "MONO_IOMAP=all", "mono", os.path.join(os.getenv('HOME'), "install", astrobeDir, "AstrobeCompile.exe"), fName])
+								e, o = cmdPollOnly(["env", "MONO_IOMAP=all", "mono", exe, fName])
 							else:
 								assert False
-							isMono = True
 						except Exception as e:
 							msg = 'mono AstrobeCompile: ' + exMsg(e)
 							return (msg, None, None)
@@ -661,27 +660,7 @@ def astrobeCompile (text: str, encodedText: bytes, encoding: str, fileName: str
 				o = o.decode(encoding)
 				msg = e + o
 
-				eLines = e.count('\n')
-				errs = []
-				warns = []
-				i = eLines
-				if isMono:
-					sep = '\n'
-				else:
-					sep = '\r\n'
-				for l in o.split(sep):
-					r = _paLineCol.match(l + '\n')
-					if r is not None:
-						line = int(r.group(1)) - 1
-						col = int(r.group(2)) - 1
-						pos = (line, col)
-						link = (i, pos)
-						m = r.group(4)
-						if r.group(3) == 'Warning':
-							warns.append(link)
-						else:
-							errs.append(link)
-					i = i + 1
+				errs, warns = outparse.parse(_astrobeOut, e, o)
 				return (msg, errs, warns)
 			finally:
 				try:
@@ -699,7 +678,13 @@ astrobeCompileLPC2000 = lambda text, encodedText, encoding, fileName: astrobeCom
 astrobeCompileM3 = lambda text, encodedText, encoding, fileName: astrobeCompile(text, encodedText, encoding, fileName, 1)
 astrobeCompileM4 = lambda text, encodedText, encoding, fileName: astrobeCompile(text, encodedText, encoding, fileName, 2)
 
-def cCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
+_cOut = outparse.Spec( (
+	Rule(_cLineCol, line=1, col=2, severity=(3, (('warning:', WARNING),), ERROR)),
+	Rule(_cLine, line=1, severity=(2, (('warning:', WARNING),), ERROR)),
+), stream='e' )
+
+# progress: see profile 'streaming' key
+def cCompile (text: str, encodedText: bytes, encoding: str, fileName: str, progress=None):
 	assert type(text) is str
 	assert type(encodedText) is bytes
 	assert encoding is not None
@@ -707,7 +692,7 @@ def cCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 
 	name = '.'.join(os.path.basename(fileName).split('.')[:-1])
 	try:
-		e, o = cmd(["make", name + '.o'])
+		e, o = cmdStream(["make", name + '.o'], partialResult(progress, _cOut, encoding))
 	except Exception as e:
 		msg = 'make: ' + exMsg(e)
 		return (msg, None, None)
@@ -716,33 +701,7 @@ def cCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	o = o.decode(encoding)
 	msg = e + o
 
-	def add (m, link):
-		if m.startswith('warning:'):
-			warns.append(link)
-		else:
-			errs.append(link)
-
-	i = 0
-	errs = []
-	warns = []
-	for l in e.split('\n'):
-		r = _pcLineCol.match(l + '\n')
-		if r is not None:
-			line = int(r.group(1)) - 1
-			col = int(r.group(2)) - 1
-			pos = (line, col)
-			link = (i, pos)
-			m = r.group(3)
-			add(m, link)
-		else:
-			r = _pcLine.match(l + '\n')
-			if r is not None:
-				line = int(r.group(1)) - 1
-				pos = (line, None)
-				link = (i, pos)
-				m = r.group(2)
-				add(m, link)
-		i = i + 1
+	errs, warns = outparse.parse(_cOut, e, o)
 	return (msg, errs, warns)
 
 def typstCompile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
@@ -768,16 +727,21 @@ def typstCompile (text: str, encodedText: bytes, encoding: str, fileName: str |
 		i = i + 1
 	return (msg, errs, warns)
 
-_pGenieLineCol = re.compile('^([^:]+):([1-9][0-9]*)\.([1-9][0-9]*)-([1-9][0-9]*)\.([1-9][0-9]*): ([^\n]+)\n')
+_genieOut = outparse.Spec( (
+	Rule('([^:\n]+):([1-9][0-9]*)\.([1-9][0-9]*)-([1-9][0-9]*)\.([1-9][0-9]*): ([^\n]+)', line=2, col=3, file=1,
+		severity=(6, (('warning:', WARNING),), ERROR)),
+), stream='e' )
 
-def genieCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
+# progress: see profile 'streaming' key
+def genieCompile (text: str, encodedText: bytes, encoding: str, fileName: str, progress=None):
 	assert type(text) is str
 	assert type(encodedText) is bytes
 	assert encoding is not None
 	assert fileName is not None # because compileSavedOnly
 
+	isFile = lambda x: sameFile(x, fileName)
 	try:
-		e, o = cmd(["make"])
+		e, o = cmdStream(["make"], partialResult(progress, _genieOut, encoding, isFile=isFile))
 	except Exception as e:
 		msg = 'make: ' + exMsg(e)
 		return (msg, None, None)
@@ -786,30 +750,12 @@ def genieCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	o = o.decode(encoding)
 	msg = e + o
 
-	def add (m, link):
-		if m.startswith('warning:'):
-			warns.append(link)
-		else:
-			errs.append(link)
-
-	i = 0
-	errs = []
-	warns = []
-	for l in e.split('\n'):
-		r = _pGenieLineCol.match(l + '\n')
-		if r is not None:
-			if sameFile(r.group(1), fileName):
-				line = int(r.group(2)) - 1
-				col = int(r.group(3)) - 1
-				pos = (line, col)
-				link = (i, pos)
-				m = r.group(6)
-				add(m, link)
-		i = i + 1
-
+	errs, warns = outparse.parse(_genieOut, e, o, isFile=isFile)
 	return (msg, errs, warns)
 
-_zcLineCol = re.compile("^([0-9]+): ([^\(]+)\(([0-9]+)\,([0-9]+)\): ([^\n]+)\n")
+_zcOut = outparse.Spec( (
+	Rule("([0-9]+): ([^(\n]+)\(([0-9]+)\,([0-9]+)\): ([^\n]+)", line=3, col=4),
+) )
 
 def zcCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	assert type(text) is str
@@ -828,27 +774,15 @@ def zcCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	o = o.decode(encoding)
 	msg = e + o
 
-	eLines = e.count('\n')
-	errs = []
-	warns = []
-	i = eLines
-	for l in o.split('\n'):
-		l = l.rstrip() + '\n'
-		r = _zcLineCol.match(l)
-		if r is not None:
-			line = int(r.group(3)) - 1
-			col = int(r.group(4)) - 1
-			pos = (line, col)
-			link = (i, pos)
-			m = r.group(5)
-			errs.append(link)
-		i = i + 1
-
+	errs, warns = outparse.parse(_zcOut, e, o)
 	return (msg, errs, warns)
 
 # example:
 # 304	14/3	CRC8.mpas	Syntax error: Expected "end" but "п" found
-_pmkpLineCol = re.compile("^(?:[0-9]+)\t([0-9]+)/([0-9]+)\t([^\t]+)\t([^\n]+)\n")
+_mkpOut = outparse.Spec( (
+	Rule("(?:[0-9]+)\t([0-9]+)/([0-9]+)\t([^\t\n]+)\t([^\n]+)", line=1, col=2, file=3,
+		severity=(4, (('Hint: ', None),), ERROR)),
+) )
 
 def mikroPascalCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	assert type(text) is str
@@ -867,26 +801,13 @@ def mikroPascalCompile (text: str, encodedText: bytes, encoding: str, fileName:
 	o = o.replace(b'\xff', b'').decode(encoding)
 	msg = e + o
 
-	eLines = e.count('\n')
-	errs = []
-	warns = []
-	i = eLines
-	for l in o.split('\n'):
-		r = _pmkpLineCol.match(l + '\n')
-		if (r is not None) and (r.group(3) == os.path.basename(fileName)):
-			line = int(r.group(1)) - 1
-			col = int(r.group(2)) - 1
-			pos = (line, col)
-			link = (i, pos)
-			m = r.group(4)
-			if m.startswith('Hint: '):
-				pass
-			else:
-				errs.append(link)
-		i = i + 1
+	baseName = os.path.basename(fileName)
+	errs, warns = outparse.parse(_mkpOut, e, o, isFile=lambda x: x == baseName)
 	return (msg, errs, warns)
 
-_pmockaLineCol = re.compile("^([0-9]+)\,([0-9]+): ([^\n]+)\n")
+_mockaOut = outparse.Spec( (
+	Rule("([0-9]+)\,([0-9]+): ([^\n]+)", line=1, col=2),
+) )
 
 def mockaCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	assert type(text) is str
@@ -905,18 +826,7 @@ def mockaCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 	o = o.decode(encoding)
 	msg = e + o
 
-	eLines = e.count('\n')
-	errs = []
-	i = eLines
-	for l in o.split('\n'):
-		r = _pmockaLineCol.match(l + '\n')
-		if r is not None:
-			line = int(r.group(1)) - 1
-			col = int(r.group(2)) - 1
-			pos = (line, col)
-			link = (i, pos)
-			errs.append(link)
-		i = i + 1
+	errs, warns = outparse.parse(_mockaOut, e, o)
 	return (msg, errs, None)
 
 _pobcLine = re.compile("^\"([^\"]+)\"\, line ([0-9]+): ([^\n]+)\n")
@@ -970,54 +880,34 @@ def obcCompile (text: str, encodedText: bytes, encoding: str, fileName: str):
 		i = i + 1
 	return (msg, errs, warns)
 
-_pxcLineCol = re.compile('\* \[([^ ]+) ([0-9]+)\.([0-9]+) [A-Z][0-9]+\]\n')
+_xcOut = outparse.Spec( (
+	Rule('\* \[([^ \n]+) ([0-9]+)\.([0-9]+) [A-Z][0-9]+\]', line=2, col=3, file=1),
+) )
 
 def xcmCompile (xCmd: str, text: str, encodedText: bytes, encoding: str, fileName: str | None, suffix: str):
 	assert type(text) is str
 	assert type(encodedText) is bytes
 	assert encoding is not None
 
-	fd, name = tempfile.mkstemp(suffix=suffix)
 	try:
-		try:
-			try:
-				os.write(fd, encodedText.replace(b'\t', b' '))
-			except Exception as e:
-				msg = tr('#File write error') + ': ' + exMsg(e)
-				return (msg, None, None)
-		finally:
-			try:
-				os.close(fd)
-			except:
-				pass
+		name = scratch.writeTemp(encodedText.replace(b'\t', b' '), suffix=suffix)
+	except Exception as e:
+		msg = tr('#File write error') + ': ' + exMsg(e)
+		return (msg, None, None)
+	try:
 		try:
 			e, o = cmd([xCmd, "=compile", name, '+CHANGESYM'])
 		except Exception as e:
 			msg = xCmd + ': ' + exMsg(e)
 			return (msg, None, None)
 	finally:
-		try:
-			os.remove(name)
-		except:
-			pass
+		scratch.remove(name)
 
 	e = e.decode(encoding)
 	o = o.decode(encoding)
 	msg = e + o
 
-	eLines = e.count('\n')
-	errs = []
-	i = eLines
-	for l in o.split('\n'):
-		r = _pxcLineCol.match(l + '\n')
-		if r is not None:
-			if r.group(1) == name:
-				line = int(r.group(2)) - 1
-				col = int(r.group(3)) - 1
-				pos = (line, col)
-				link = (i, pos)
-				errs.append(link)
-		i = i + 1
+	errs, warns = outparse.parse(_xcOut, e, o, isFile=lambda x: x == name)
 	return (msg, errs, None)
 
 def xcCompileM2 (text, encodedText, encoding, fileName):
@@ -1133,12 +1023,15 @@ def luaCompile (text: str, encodedText: bytes, encoding: str, fileName: str | No
 
 	close_fds = not mswindows
 	try:
-		p = subprocess.Popen(args, bufsize=8192, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=close_fds)
+		p = popen(args, bufsize=8192, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=close_fds)
 	except Exception as e:
 		msg = 'luac-5.1: ' + exMsg(e)
 		return (msg, None, None)
 
-	o, e = p.communicate(encodedText)
+	try:
+		o, e = p.communicate(encodedText)
+	finally:
+		released(p)
 
 	e = e.decode(encoding)
 	o = o.decode(encoding)
@@ -1153,19 +1046,46 @@ def luaCompile (text: str, encodedText: bytes, encoding: str, fileName: str | No
 	else:
 		return (msg, None, None)
 
+COCO_MAX_ERRORS = 100 # cocodrivers stop parsing after so many errors, None: no limit (rops-check)
+COCO_SESSIONS = 8 # cocodrivers incremental parse sessions (files) to keep
+
+_cocoSessions = collections.OrderedDict() # (grammar, fileName) -> session
+_cocoSessionsLock = threading.Lock()
+
+# incremental parse: next versions of the same file reuse tokens and parser state before the edit
+def cocoProcess (grammar, text: str, fileName: str | None):
+	key = (grammar.__name__, fileName)
+	with _cocoSessionsLock:
+		session = _cocoSessions.get(key)
+		if session is None:
+			session = grammar.Session()
+			_cocoSessions[key] = session
+		_cocoSessions.move_to_end(key)
+		while len(_cocoSessions) > COCO_SESSIONS:
+			_cocoSessions.popitem(last=False)
+	return session.Process(text, COCO_MAX_ERRORS)
+
+# parsing stopped by COCO_MAX_ERRORS: last message tells it, at position of last error
+def cocoCompileResult (x):
+	msg, errs, warns = cocodrivers.toCompileResult(x)
+	if (COCO_MAX_ERRORS is not None) and (len(x) >= COCO_MAX_ERRORS):
+		msg = msg + '\n' + tr('#too many errors, parsing stopped')
+		errs.append( (len(x), errs[-1][1]) )
+	return (msg, errs, warns)
+
 def umbrielCompile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
 	assert type(encodedText) is bytes
 	assert encoding is not None
 
-	return cocodrivers.toCompileResult( cocodrivers.Umbriel.Process(text) )
+	return cocoCompileResult( cocoProcess(cocodrivers.Umbriel, text, fileName) )
 
 def oberon0Compile (text: str, encodedText: bytes, encoding: str, fileName: str | None):
 	assert type(text) is str
 	assert type(encodedText) is bytes
 	assert encoding is not None
 
-	return cocodrivers.toCompileResult( cocodrivers.Oberon0.Process(text) )
+	return cocoCompileResult( cocoProcess(cocodrivers.Oberon0, text, fileName) )
 
 _ppyCocoLineCol = re.compile("^file ([^ ]+) : \(([0-9]+), ([0-9]+)\) (.+)$")
 
@@ -1177,30 +1097,20 @@ def pyCocoCompile (text: str, encodedText: bytes, encoding: str, fileName: str |
 	xCmd = "cocopy"
 	# cocopy requirements: atg file must be in current directory
 
-	fd, name = tempfile.mkstemp(dir=".")
+	try:
+		name = scratch.writeTemp(encodedText, dir=".")
+	except Exception as e:
+		msg = tr('#File write error') + ': ' + exMsg(e)
+		return (msg, None, None)
 	bName = os.path.basename(name)
 	try:
-		try:
-			try:
-				os.write(fd, encodedText)
-			except Exception as e:
-				msg = tr('#File write error') + ': ' + exMsg(e)
-				return (msg, None, None)
-		finally:
-			try:
-				os.close(fd)
-			except:
-				pass
 		try:
 			e, o = cmd([xCmd, "-t", bName])
 		except Exception as e:
 			msg = xCmd + ': ' + exMsg(e)
 			return (msg, None, None)
 	finally:
-		try:
-			os.remove(name)
-		except:
-			pass
+		scratch.remove(name)
 
 	e = e.decode(encoding)
 	o = o.decode(encoding)
@@ -1384,6 +1294,7 @@ c = {
 	'extensions': ('c',),
 	'compile': cCompile,
 	'compileSavedOnly': True, # because compile with make
+	'streaming': True, # compile reports partial results, see cCompile
 	'empty': ('int main (int argc, char* argv[])\n{\n\t\n\n\treturn 0;\n}\n', 2, 1),
 }
 
@@ -1393,6 +1304,7 @@ cxx = {
 	'extensions': ('cxx', 'cpp'),
 	'compile': cCompile, # because compile with make
 	'compileSavedOnly': True,
+	'streaming': True,
 }
 
 zc = {
@@ -1448,10 +1360,12 @@ python = {
 	'style': ('kate',), # gtksourceview
 	'extensions': ('py', 'pyw'),
 	'compile': pyCompile,
+	'cache': True, # result depends on the text only, see cache
 	'import': pyImport,
 	'export': pyExport,
 	'empty': ("#! /usr/bin/env python\n# -*- coding: %s -*-\n\ndef main ():\n\t\n\nif __name__ == '__main__':\n\tmain()\n" % (locale.getpreferredencoding().lower()), 0, 22),
 	'sharpComments': True,
+	'liveCheck': True, # check as you type
 }
 
 lua = {
@@ -1466,6 +1380,7 @@ dcc32 = {
 	'lang': 'pascal', # gtksourceview
 	'extensions': ('pas', 'dpr'),
 	'compile': dcc32Compile,
+	'wine': True, # compiler runs with wine (not mswindows), see warmhost
 	'preferredFileEncoding': winEncoding(),
 	'empty': delphiEmpty,
 	'lineSep': '\r\n', # не обязательно
@@ -1578,6 +1493,7 @@ genie = {
 	'extensions': ('gs',),
 	'compile': genieCompile,
 	'compileSavedOnly': True, # because compile with make
+	'streaming': True, # compile reports partial results, see genieCompile
 }
 
 iverilog = {
@@ -1605,8 +1521,10 @@ umbriel = {
 	'style': ('strict',), # gtksourceview
 	'extensions': ('umb',),
 	'compile': umbrielCompile,
+	'cache': True, # result depends on the text only, see cache
 	'empty': modObEmpty,
 	'lineSep': '\n',
+	'liveCheck': True, # check as you type
 }
 
 oberon0 = {
@@ -1615,8 +1533,10 @@ oberon0 = {
 	'style': ('strict',), # gtksourceview
 	'extensions': ('ob0',),
 	'compile': oberon0Compile,
+	'cache': True, # result depends on the text only, see cache
 	'empty': modObEmpty,
 	'lineSep': '\n',
+	'liveCheck': True, # check as you type
 }
 
 pyCoco = {
@@ -1663,6 +1583,14 @@ profiles = (
 	iverilog, gvhdl,
 )
 
+# profiles by file extension
+def byExtension (fileName: str):
+	if '.' in fileName:
+		ext = fileName.split('.')[-1:][0]
+		return [ prof for prof in profiles if ext in prof['extensions'] ]
+	else:
+		return []
+
 def test ():
 	print(cmdPollOnly(['winepath', '-w', '111']))
 
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# per-session scratch workspace for temporary source files of compilers,
+# located in RAM (tmpfs) when possible, removed on exit
+#
+# dir name contains PID of owner process: dirs left by dead processes are removed
+# when a new session dir is created; worker processes (which exit without atexit)
+# use session dir of parent, see useDir
+#
+
+import os, tempfile, shutil, threading, atexit
+
+Trace = True
+
+RAM_DIRS = ('/dev/shm',)
+
+PREFIX = 'rops-'
+
+_dir = None
+_owned = False # _dir is created by this process
+_lock = threading.Lock()
+
+def _baseDir ():
+	for d in RAM_DIRS:
+		if os.path.isdir(d) and os.access(d, os.W_OK | os.X_OK):
+			return d
+	return None # tempfile default
+
+def _pidAlive (pid: int) -> bool:
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except OSError: # EPERM
+		return True
+	else:
+		return True
+
+# remove session dirs of dead processes
+def sweep (base: str | None = None):
+	if base is None:
+		base = _baseDir() or tempfile.gettempdir()
+	try:
+		entries = list(os.scandir(base))
+	except OSError:
+		return
+	uid = os.getuid()
+	for x in entries:
+		if not x.name.startswith(PREFIX):
+			continue
+		pid = x.name[len(PREFIX):].split('-', 1)[0]
+		if not pid.isdigit() or _pidAlive(int(pid)):
+			continue
+		try:
+			if not x.is_dir(follow_symlinks=False) or (x.stat(follow_symlinks=False).st_uid != uid):
+				continue
+		except OSError:
+			continue
+		if Trace: print('scratch dir removed:', x.path)
+		shutil.rmtree(x.path, ignore_errors=True)
+
+def sessionDir () -> str:
+	global _dir, _owned
+	with _lock:
+		if (_dir is None) or not os.path.isdir(_dir):
+			base = _baseDir()
+			sweep(base)
+			_dir = tempfile.mkdtemp(prefix='%s%d-' % (PREFIX, os.getpid()), dir=base)
+			_owned = True
+			if Trace: print('scratch dir:', _dir)
+		return _dir
+
+# use session dir of parent process (not removed by this process)
+def useDir (dir: str):
+	global _dir, _owned
+	with _lock:
+		_dir = dir
+		_owned = False
+
+# write data to new file (in scratch workspace by default), return its name
+def writeTemp (data: bytes, prefix: str | None = None, suffix: str | None = None, dir: str | None = None) -> str:
+	assert type(data) is bytes
+
+	if dir is None:
+		dir = sessionDir()
+	fd, name = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=dir)
+	try:
+		with os.fdopen(fd, 'wb') as fh:
+			fh.write(data)
+	except:
+		remove(name)
+		raise
+	return name
+
+def remove (name: str):
+	try:
+		os.remove(name)
+	except OSError:
+		pass
+
+def cleanup ():
+	global _dir
+	with _lock:
+		if (_dir is not None) and _owned:
+			shutil.rmtree(_dir, ignore_errors=True)
+		_dir = None
+
+atexit.register(cleanup)
@@ -1,15 +1,112 @@
 # Alexander Shiryaev, 2010, 2024
+#
+# persistent stores (settings, cursor positions etc.):
+#   SQLite database in WAL mode, shared by running instances,
+#   values are pickled, every write is a transaction;
+#   fallback (no sqlite3 or database can not be opened): pickle file per store
+#
+# pickle files of previous versions are migrated to the database on first access
+#
+# stores are read once and kept in memory (write-behind):
+# changes are written together FLUSH_DELAY after the first one, on flush and at exit
+#
 
-import os, sys, pickle
+import os, sys, time, threading, tempfile, copy, collections, atexit
 import pickle
 import appdirs
+try:
+	import sqlite3
+except ImportError:
+	SQLITE = False
+else:
+	SQLITE = True
 
 storeDir = os.path.join(appdirs.user_config_dir(), 'rops')
 
-def load (name: str, default):
+DB_NAME = 'store.db'
+DB_TIMEOUT = 5.0 # s, wait for lock of other instance
+FLUSH_DELAY = 2.0 # s, changes are coalesced for this time
+
+_lock = threading.RLock() # memory
+_dbLock = threading.RLock() # database connection; lock order: _lock, _dbLock
+_flushLock = threading.Lock()
+_conn = None
+_connFailed = False
+_migrated = set() # names of stores
+_lastStamp = 0.0
+
+_dicts = {} # name -> (Table, default) of dict stores, see load
+_NONE = object() # missing key, see save
+_dirty = set() # Table instances to write
+_timer = None # flush timer
+
+# time of put, increasing within process
+def _stamp () -> float:
+	global _lastStamp
+	with _lock:
+		_lastStamp = max(time.time(), _lastStamp + 1e-6)
+		return _lastStamp
+
+def _mkStoreDir () -> bool:
+	if not os.path.exists(storeDir):
+		try:
+			os.mkdir(storeDir)
+		except Exception as e:
+			print('Error on mkdir %s:' % (repr(storeDir),), repr(e), e)
+			return False
+	return True
+
+# return values: connection | None (use pickle files)
+def _db ():
+	global _conn, _connFailed
+	with _dbLock:
+		if (_conn is None) and SQLITE and not _connFailed:
+			if not _mkStoreDir():
+				_connFailed = True
+				return None
+			try:
+				conn = sqlite3.connect(os.path.join(storeDir, DB_NAME), timeout=DB_TIMEOUT,
+					isolation_level=None, check_same_thread=False)
+				conn.execute('PRAGMA journal_mode=WAL')
+				conn.execute('PRAGMA synchronous=NORMAL')
+				conn.execute('CREATE TABLE IF NOT EXISTS kv (name TEXT NOT NULL, key TEXT NOT NULL, stamp REAL NOT NULL, value BLOB NOT NULL, PRIMARY KEY (name, key))')
+				conn.execute('CREATE INDEX IF NOT EXISTS kv_stamp ON kv (name, stamp)')
+			except Exception as e:
+				print('Exception on open store db:', repr(e), e)
+				_connFailed = True
+			else:
+				_conn = conn
+		return _conn
+
+class _Transaction:
+
+	def __init__ (self, conn):
+		self.conn = conn
+
+	def __enter__ (self):
+		_dbLock.acquire()
+		try:
+			self.conn.execute('BEGIN IMMEDIATE')
+		except:
+			_dbLock.release()
+			raise
+		return self.conn
+
+	def __exit__ (self, exType, ex, tb):
+		try:
+			if exType is None:
+				self.conn.execute('COMMIT')
+			else:
+				self.conn.execute('ROLLBACK')
+		finally:
+			_dbLock.release()
+
+def _loadPickle (name: str, default):
 	fileName = os.path.join(storeDir, name)
 	try:
 		fh = open(fileName, 'rb')
+	except FileNotFoundError:
+		data = default
 	except Exception as e:
 		print('Exception on open %s db:' % (name,), repr(e), e)
 		data = default
@@ -24,28 +121,230 @@ def load (name: str, default):
 			fh.close()
 	return data
 
-def save (name: str, data) -> bool:
-	if not os.path.exists(storeDir):
-		try:
-			os.mkdir(storeDir)
-		except Exception as e:
-			print('Error on mkdir %s:' % (repr(storeDir),), repr(e), e)
-			return False
+# atomic: readers see old or new file
+def _savePickle (name: str, data) -> bool:
+	if not _mkStoreDir():
+		return False
 
-	fileName = os.path.join(storeDir, name)
 	try:
-		fh = open(fileName, 'wb')
+		fd, tmpName = tempfile.mkstemp(dir=storeDir, prefix='.' + name + '.')
+		try:
+			with os.fdopen(fd, 'wb') as fh:
+				pickle.dump(data, fh, protocol=2)
+			os.replace(tmpName, os.path.join(storeDir, name))
+		except:
+			os.remove(tmpName)
+			raise
 	except Exception as e:
-		print('Exception on open %s db:' % (name,), repr(e), e)
+		print('Exception on save %s db:' % (name,), repr(e), e)
 		return False
 	else:
+		return True
+
+# move pickle file of store to database once;
+# rows: function (data) -> ( (key, value, stamp), ... )
+def _migrate (conn, name: str, rows):
+	if name in _migrated:
+		return
+	fileName = os.path.join(storeDir, name)
+	if os.path.exists(fileName):
+		data = _loadPickle(name, None)
 		try:
+			with _Transaction(conn):
+				if conn.execute('SELECT 1 FROM kv WHERE name = ? LIMIT 1', (name,)).fetchone() is None:
+					if data is not None:
+						conn.executemany('INSERT INTO kv (name, key, stamp, value) VALUES (?, ?, ?, ?)',
+							[ (name, key, stamp, pickle.dumps(value, protocol=2)) for key, value, stamp in rows(data) ])
+			os.replace(fileName, fileName + '.bak')
+		except Exception as e:
+			print('Exception on migrate %s db:' % (name,), repr(e), e)
+		else:
+			print('%s db migrated' % (name,))
+	_migrated.add(name)
+
+# x: Table
+def _schedule (x):
+	global _timer
+	with _lock:
+		_dirty.add(x)
+		if _timer is None:
+			_timer = threading.Timer(FLUSH_DELAY, flush)
+			_timer.daemon = True
+			_timer.start()
+
+# write changes, return values: True (ok) | False (not written changes are kept for next flush)
+def flush () -> bool:
+	global _timer
+	with _flushLock:
+		with _lock:
+			if _timer is not None:
+				_timer.cancel()
+				_timer = None
+			dirty = list(_dirty)
+			_dirty.clear()
+		ok = True
+		for x in dirty:
+			done = x._flush()
+			if not done:
+				with _lock:
+					_dirty.add(x)
+				ok = False
+		return ok
+
+atexit.register(flush)
+
+# store of (key: str, value) items, read once, then read and changed in memory,
+# changed items are written by flush;
+# stamp of item: time of last put, see putMany maxLen
+class Table:
+
+	# migrate: function (data of pickle file) -> ( (key, value, stamp), ... )
+	def __init__ (self, name: str, migrate=None):
+		self.name = name
+		self.migrate = migrate
+		self.data = None # { key: (value, stamp) } in order of stamps, loaded on first access
+		self.dirty = set() # keys
+		self.deleted = set() # keys
+		self.maxLen = None
+
+	def _load (self):
+		if self.data is not None:
+			return
+		data = collections.OrderedDict()
+		conn = _db()
+		if conn is not None:
+			_migrate(conn, self.name, self.migrate or (lambda data: ()))
 			try:
-				pickle.dump(data, fh, protocol=2)
+				with _dbLock:
+					rows = conn.execute('SELECT key, stamp, value FROM kv WHERE name = ? ORDER BY stamp', (self.name,)).fetchall()
+				for key, stamp, value in rows:
+					data[key] = (pickle.loads(value), stamp)
+			except Exception as e:
+				print('Exception on load %s db:' % (self.name,), repr(e), e)
+		else:
+			x = _loadPickle(self.name + '.table', None)
+			if (x is None) and (self.migrate is not None):
+				y = _loadPickle(self.name, None)
+				if y is not None:
+					x = { key: (value, stamp) for key, value, stamp in self.migrate(y) }
+					_schedule(self)
+			if x is not None:
+				for key, (value, stamp) in sorted(x.items(), key=lambda item: item[1][1]):
+					data[key] = (value, stamp)
+		self.data = data
+
+	def get (self, key: str, default=None):
+		with _lock:
+			self._load()
+			return self.data.get(key, (default, None))[0]
+
+	# in order of stamps
+	def items (self):
+		with _lock:
+			self._load()
+			return [ (key, value) for key, (value, stamp) in self.data.items() ]
+
+	# put items ( (key, value), ... ),
+	# then keep maxLen recently put items (maxLen is not None)
+	def putMany (self, items, maxLen: int | None = None) -> bool:
+		with _lock:
+			self._load()
+			data = self.data
+			for key, value in items:
+				data[key] = (value, _stamp())
+				data.move_to_end(key)
+				self.dirty.add(key)
+				self.deleted.discard(key)
+			if maxLen is not None:
+				self.maxLen = maxLen
+				while len(data) > maxLen:
+					key, x = data.popitem(last=False)
+					self.dirty.discard(key)
+					self.deleted.add(key)
+			_schedule(self)
+		return True
+
+	def put (self, key: str, value, maxLen: int | None = None) -> bool:
+		return self.putMany( ((key, value),), maxLen )
+
+	# item is used: stamp as recently put
+	def touch (self, key: str) -> bool:
+		with _lock:
+			self._load()
+			x = self.data.get(key)
+			if x is not None:
+				self.data[key] = (x[0], _stamp())
+				self.data.move_to_end(key)
+				self.dirty.add(key)
+				_schedule(self)
+		return True
+
+	def delete (self, key: str) -> bool:
+		with _lock:
+			self._load()
+			if self.data.pop(key, None) is not None:
+				self.dirty.discard(key)
+				self.deleted.add(key)
+				_schedule(self)
+		return True
+
+	def _flush (self) -> bool:
+		with _lock:
+			conn = _db()
+			if conn is None:
+				data = dict(self.data)
+			else:
+				rows = [ (self.name, key, stamp, pickle.dumps(value, protocol=2))
+					for key in self.dirty for value, stamp in (self.data[key],) ]
+				deleted = [ (self.name, key) for key in self.deleted ]
+				maxLen = self.maxLen
+			dirtyKeys, deletedKeys = self.dirty, self.deleted
+			self.dirty, self.deleted = set(), set()
+		if conn is None:
+			ok = _savePickle(self.name + '.table', data)
+		else:
+			try:
+				with _Transaction(conn):
+					conn.executemany('INSERT OR REPLACE INTO kv (name, key, stamp, value) VALUES (?, ?, ?, ?)', rows)
+					conn.executemany('DELETE FROM kv WHERE name = ? AND key = ?', deleted)
+					if maxLen is not None: # also items of other instances
+						conn.execute('DELETE FROM kv WHERE name = ? AND key IN (SELECT key FROM kv WHERE name = ? ORDER BY stamp DESC LIMIT -1 OFFSET ?)',
+							(self.name, self.name, maxLen))
 			except Exception as e:
-				print('Exception on save %s db:' % (name,), repr(e), e)
-				return False
+				print('Exception on save %s db:' % (self.name,), repr(e), e)
+				ok = False
 			else:
-				return True
-		finally:
-			fh.close()
+				ok = True
+		if not ok: # keep changes not changed again meanwhile
+			with _lock:
+				self.dirty.update( key for key in dirtyKeys if key in self.data )
+				self.deleted.update( key for key in deletedKeys if key not in self.data )
+		return ok
+
+# dict store (settings etc.), one item per key: instance writes the keys changed by it,
+# keys changed by other instances are kept;
+# pickle file of previous versions: whole dict
+
+def _migrateDict (data):
+	if type(data) is not dict:
+		return ()
+	return [ (key, value, 0.0) for key, value in data.items() ]
+
+# return values: copy of default updated by stored keys
+def load (name: str, default: dict) -> dict:
+	with _lock:
+		if name not in _dicts:
+			_dicts[name] = (Table(name, _migrateDict), copy.deepcopy(default))
+		table, default = _dicts[name]
+		data = copy.deepcopy(default)
+		data.update( copy.deepcopy(table.items()) )
+		return data
+
+# write keys changed since load or last save, return value: True (accepted, written later)
+def save (name: str, data: dict) -> bool:
+	with _lock:
+		if name not in _dicts:
+			load(name, {})
+		table, default = _dicts[name]
+		return table.putMany( [ (key, copy.deepcopy(value)) for key, value in data.items()
+			if table.get(key, default.get(key, _NONE)) != value ] )
@@ -1,7 +1,56 @@
 # Alexander Shiryaev, 2010
 
+import re
+
 Trace = True
 
+# return values: '\n' | '\r\n' | '\r'
+def detectLineSep (text: str):
+	ns = text.count('\n')
+	rs = text.count('\r')
+	rns = text.count('\r\n')
+	ns = ns - rns
+	rs = rs - rns
+	if Trace: print('ns:', ns, 'rns:', rns, 'rs:', rs)
+	if (rns > ns) and (rns > rs):
+		return '\r\n'
+	elif (rs > ns) and (rs > rns):
+		return '\r'
+	else:
+		return '\n'
+
+def splitToLines (text: str):
+	lines = []
+	for l in text.split('\r\n'):
+		for l1 in re.split( '[\r\n]', l ):
+			lines.append(l1)
+	return lines
+
+normalizeLineSep = lambda text, lineSep: lineSep.join( splitToLines(text) )
+
+# map diagnostic links (msgLine, (line, col)) of oldLines to newLines (texts split to lines):
+# links to lines before and after the changed region are shifted,
+# links into the changed region are dropped; links: list | None
+def shiftLinks (links, oldLines, newLines):
+	if links is None:
+		return None
+	n = min(len(oldLines), len(newLines))
+	p = 0
+	while (p < n) and (oldLines[p] == newLines[p]):
+		p = p + 1
+	s = 0
+	while (s < n - p) and (oldLines[-1 - s] == newLines[-1 - s]):
+		s = s + 1
+	tail = len(oldLines) - s # first line of unchanged tail
+	delta = len(newLines) - len(oldLines)
+	r = []
+	for msgLine, (line, col) in links:
+		if (line is None) or (line < p):
+			r.append( (msgLine, (line, col)) )
+		elif line >= tail:
+			r.append( (msgLine, (line + delta, col)) )
+	return r
+
 def getSelLines (buffer):
 	bounds = buffer.get_selection_bounds()
 	if bounds != ():
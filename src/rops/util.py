@@ -1,6 +1,11 @@
 # Alexander Shiryaev, 2010, 2024
 
-import os
+import os, tempfile
+
+# umask is process-wide: read once on import (main thread), never changed later,
+# other threads would create files with umask 0 meanwhile
+_umask = os.umask(0)
+os.umask(_umask)
 
 def readFile (fileName):
 	with open(fileName, 'rb') as fh:
@@ -14,5 +19,95 @@ def writeFile (fileName: str, data: bytes, sync: bool = True):
 		if sync:
 			os.fsync(fh.fileno())
 
+# copy extended attributes (ACLs etc.) of file to fd,
+# return values: True | False (not all copied)
+def _copyXattrs (fileName: str, fd: int) -> bool:
+	if not hasattr(os, 'listxattr'):
+		return True
+	try:
+		names = os.listxattr(fileName)
+	except OSError: # not supported by file system
+		return True
+	try:
+		for n in names:
+			os.setxattr(fd, n, os.getxattr(fileName, n))
+	except OSError:
+		return False
+	return True
+
+# write to temporary file in directory d, then replace file by it;
+# st: os.stat of file | None (new file)
+# return values: True | False (not written: directory is not writable,
+#	owner or extended attributes of file can not be kept)
+def _replaceWrite (fileName: str, d: str, st, data: bytes, sync: bool) -> bool:
+	try:
+		fd, tmpName = tempfile.mkstemp(dir=d, prefix='.' + os.path.basename(fileName) + '.')
+	except PermissionError:
+		return False
+	try:
+		with os.fdopen(fd, 'wb') as fh:
+			fh.write(data)
+			fh.flush()
+			if st is None:
+				mode = 0o666 & ~_umask
+			else:
+				mode = st.st_mode & 0o7777
+				if hasattr(os, 'fchown'):
+					tst = os.fstat(fh.fileno())
+					if (tst.st_uid, tst.st_gid) != (st.st_uid, st.st_gid):
+						try:
+							os.fchown(fh.fileno(), st.st_uid, st.st_gid)
+						except PermissionError:
+							return False
+				if not _copyXattrs(fileName, fh.fileno()):
+					return False
+			if hasattr(os, 'fchmod'): # after fchown, it clears setuid bits
+				os.fchmod(fh.fileno(), mode)
+			if sync:
+				if hasattr(os, 'fdatasync'):
+					os.fdatasync(fh.fileno())
+				else:
+					os.fsync(fh.fileno())
+		try:
+			os.replace(tmpName, fileName)
+		except PermissionError:
+			return False
+		tmpName = None
+	finally:
+		if tmpName is not None:
+			try:
+				os.remove(tmpName)
+			except OSError:
+				pass
+
+	if sync and hasattr(os, 'O_DIRECTORY'): # rename itself
+		try:
+			dfd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+		except OSError:
+			pass
+		else:
+			try:
+				os.fsync(dfd)
+			except OSError:
+				pass
+			finally:
+				os.close(dfd)
+	return True
+
+# write to temporary file in the same directory, then replace file by it:
+# file has old or new content at any time;
+# written in place (writeFile) if replace is not possible or would lose hard links,
+# owner or extended attributes of file
+def writeFileAtomic (fileName: str, data: bytes, sync: bool = True):
+	assert type(data) is bytes
+
+	fileName = os.path.realpath(fileName) # replace target of symlink
+	try:
+		st = os.stat(fileName)
+	except FileNotFoundError:
+		st = None
+	if ((st is not None) and (st.st_nlink > 1)) or not _replaceWrite(fileName, os.path.dirname(fileName), st, data, sync):
+		writeFile(fileName, data, sync)
+
 def dataDir ():
 	return os.path.dirname(__file__)
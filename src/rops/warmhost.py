@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# keep compiler hosts warm for the whole session (not mswindows):
+#   wine: persistent wineserver, restarted when it dies
+#   mono: ahead-of-time compiled image of the compiler executable
+#
+
+import os, subprocess, threading, time, atexit, socket
+
+Trace = True
+
+RESTART_DELAY = 5.0 # s, do not restart more often
+PERSISTENT_TIMEOUT = 600 # s, idle wineserver exits by itself (if not shut down at exit)
+
+# socket of wineserver of prefix, see wine server/request.c
+def wineSocket () -> str | None:
+	prefix = os.environ.get('WINEPREFIX') or os.path.join(os.path.expanduser('~'), '.wine')
+	try:
+		st = os.stat(prefix)
+	except OSError:
+		return None
+	return os.path.join('/tmp', '.wine-%d' % (os.getuid(),), 'server-%x-%x' % (st.st_dev, st.st_ino), 'socket')
+
+# wineserver (of this or another process) serves the prefix
+def wineRunning () -> bool:
+	name = wineSocket()
+	if (name is None) or not os.path.exists(name):
+		return False
+	s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		s.connect(name)
+	except OSError:
+		return False
+	else:
+		return True
+	finally:
+		s.close()
+
+class WineServer:
+
+	def __init__ (self):
+		self.lock = threading.Lock()
+		self.p = None
+		self.started = None # time.monotonic() of last start
+		self.external = False # served by wineserver of another process
+		self.enabled = True # False: do not start (rops-check workers, started by parent)
+
+	# start wineserver if it is not running
+	def ensure (self):
+		with self.lock:
+			if not self.enabled:
+				return
+			if (self.p is not None) and (self.p.poll() is None):
+				return
+			if wineRunning():
+				if not self.external:
+					if Trace: print('wineserver running')
+					self.external = True
+				return
+			self.external = False
+			now = time.monotonic()
+			if (self.started is not None) and (now - self.started < RESTART_DELAY):
+				return
+			if self.p is not None:
+				if Trace: print('wineserver exited:', self.p.returncode)
+			self.started = now
+			try:
+				self.p = subprocess.Popen(["wineserver", "--foreground", "--persistent=%d" % (PERSISTENT_TIMEOUT,)],
+					stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+					close_fds=True)
+			except Exception as e:
+				print('can not start wineserver:', repr(e), e)
+				self.p = None
+			else:
+				if Trace: print('wineserver started:', self.p.pid)
+
+	def shutdown (self):
+		with self.lock:
+			p = self.p
+			self.p = None
+		if (p is not None) and (p.poll() is None):
+			if Trace: print('wineserver shutdown')
+			p.terminate()
+			try:
+				p.wait(5.0)
+			except subprocess.TimeoutExpired:
+				p.kill()
+
+wine = WineServer()
+
+_aotDone = set()
+_aotLock = threading.Lock()
+
+# compile mono executable to native image once (in background), mono uses it on next starts
+def monoAot (exe: str):
+	with _aotLock:
+		if exe in _aotDone:
+			return
+		_aotDone.add(exe)
+
+	def run ():
+		try:
+			img = exe + '.so'
+			if os.path.exists(img) and (os.path.getmtime(img) >= os.path.getmtime(exe)):
+				return
+			if Trace: print('mono aot', exe)
+			subprocess.run(["mono", "--aot", exe],
+				stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+				close_fds=True)
+		except Exception as e:
+			print('mono aot failed:', repr(e), e)
+
+	threading.Thread(target=run, name='mono-aot', daemon=True).start()
+
+atexit.register(wine.shutdown)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# background worker: runs one job at a time on a separate thread,
+# a newer job supersedes a pending one and makes the running one stale
+#
+
+import threading, traceback
+
+Trace = True
+
+class Worker:
+
+	def __init__ (self, name: str):
+		self.name = name
+		self.cond = threading.Condition()
+		self.generation = 0 # generation of the last submitted job
+		self.pending = None # (generation, job, done, dropped)
+		self.running = None # generation of the running job
+		self.thread = threading.Thread(target=self._loop, name=name, daemon=True)
+		self.thread.start()
+
+	# job: () -> result, called on the worker thread
+	# done: (generation, result, exc) -> None, called on the worker thread for non-stale jobs only
+	# dropped: () -> None, called instead of job if the job is dropped before start
+	#	(releases what the job would release)
+	# return value: generation of the submitted job
+	def submit (self, job, done, dropped=None) -> int:
+		with self.cond:
+			self.generation = self.generation + 1
+			old = self.pending
+			self.pending = (self.generation, job, done, dropped)
+			self.cond.notify_all()
+			generation = self.generation
+		self._dropped(old)
+		return generation
+
+	# make all submitted jobs stale
+	def cancel (self):
+		with self.cond:
+			self.generation = self.generation + 1
+			old = self.pending
+			self.pending = None
+		self._dropped(old)
+
+	def _dropped (self, pending):
+		if pending is not None:
+			if Trace: print(self.name, 'drop pending job', pending[0])
+			if pending[3] is not None:
+				pending[3]()
+
+	def isCurrent (self, generation: int) -> bool:
+		return generation == self.generation
+
+	def busy (self) -> bool:
+		with self.cond:
+			return (self.running is not None) or (self.pending is not None)
+
+	# wait until the running job (if any) is finished
+	def wait (self):
+		with self.cond:
+			while self.running is not None:
+				self.cond.wait()
+
+	def _loop (self):
+		while True:
+			with self.cond:
+				while self.pending is None:
+					self.cond.wait()
+				generation, job, done, dropped = self.pending
+				self.pending = None
+				self.running = generation
+			try:
+				try:
+					result = job()
+				except Exception as e:
+					traceback.print_exc()
+					result, exc = None, e
+				else:
+					exc = None
+				if generation == self.generation:
+					done(generation, result, exc)
+				elif Trace:
+					print(self.name, 'drop stale result', generation)
+			finally:
+				with self.cond:
+					self.running = None
+					self.cond.notify_all()
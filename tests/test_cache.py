@@ -0,0 +1,91 @@
+# compile results cache
+
+import os
+import pytest
+
+from rops import cache
+
+@pytest.fixture
+def compiles ():
+	calls = []
+
+	def profile (result, **kw):
+		def compile (text, encodedText, encoding, fileName):
+			calls.append(text)
+			return result
+		prof = { 'name': 'p', 'compile': compile }
+		prof.update(kw)
+		return prof
+
+	profile.calls = calls
+	return profile
+
+def test_key ():
+	k = cache.makeKey('p', b'text', 'utf-8', '/a')
+	assert k == cache.makeKey('p', b'text', 'utf-8', '/a')
+	assert len( { k, cache.makeKey('q', b'text', 'utf-8', '/a'), cache.makeKey('p', b'text2', 'utf-8', '/a'),
+		cache.makeKey('p', b'text', None, '/a'), cache.makeKey('p', b'text', 'utf-8', None) } ) == 5
+
+def test_cacheable ():
+	assert cache.cacheable({ 'cache': True })
+	# external compilers read other files
+	assert not cache.cacheable({})
+	assert not cache.cacheable({ 'compileSavedOnly': True })
+
+def test_hit (tmp_path, compiles):
+	c = cache.CompileCache(diskDir=str(tmp_path))
+	prof = compiles( ('err', [ (0, (1, 2)) ], None), cache=True )
+	for i in range(3):
+		assert c.compile(prof, 'x', b'x', 'utf-8', None) == ('err', [ (0, (1, 2)) ], None)
+	c.compile(prof, 'y', b'y', 'utf-8', None)
+	assert compiles.calls == [ 'x', 'y' ]
+
+	# disk tier: next session
+	c = cache.CompileCache(diskDir=str(tmp_path))
+	c.compile(prof, 'x', b'x', 'utf-8', None)
+	assert compiles.calls == [ 'x', 'y' ]
+
+def test_not_cacheable (tmp_path, compiles):
+	c = cache.CompileCache(diskDir=str(tmp_path))
+	prof = compiles( ('', None, None) )
+	c.compile(prof, 'x', b'x', 'utf-8', None)
+	c.compile(prof, 'x', b'x', 'utf-8', None)
+	assert compiles.calls == [ 'x', 'x' ]
+
+@pytest.mark.parametrize('result', (
+	('voc: not found', None, None),
+	('env: voc: No such file or directory\n', [], []),
+))
+def test_failure_not_cached (tmp_path, compiles, result):
+	c = cache.CompileCache(diskDir=str(tmp_path))
+	prof = compiles(result, cache=True)
+	c.compile(prof, 'x', b'x', 'utf-8', None)
+	c.compile(prof, 'x', b'x', 'utf-8', None)
+	assert compiles.calls == [ 'x', 'x' ]
+	assert os.listdir(tmp_path) == []
+
+def test_live_check_memory_only (tmp_path, compiles):
+	c = cache.CompileCache(diskDir=str(tmp_path / 'cache'))
+	prof = compiles( ('', None, None), cache=True, liveCheck=True )
+	c.compile(prof, 'x', b'x', 'utf-8', None, live=True)
+	c.compile(prof, 'x', b'x', 'utf-8', None, live=True)
+	assert compiles.calls == [ 'x' ]
+	assert not os.path.exists(tmp_path / 'cache')
+
+	# manual compile of the same profile: disk tier, found by next session
+	c.compile(prof, 'y', b'y', 'utf-8', None)
+	c = cache.CompileCache(diskDir=str(tmp_path / 'cache'))
+	c.compile(prof, 'y', b'y', 'utf-8', None)
+	c.compile(prof, 'x', b'x', 'utf-8', None, live=True)
+	assert compiles.calls == [ 'x', 'y', 'x' ]
+
+def test_lru (tmp_path):
+	c = cache.CompileCache(memLen=2, diskDir=str(tmp_path), diskLen=3)
+	for i in range(5):
+		c.put('k%d' % i, ('', None, None))
+		os.utime(tmp_path / ('k%d' % i), (i + 1, i + 1)) # eviction order by mtime
+	assert list(c.mem.keys()) == [ 'k3', 'k4' ]
+	assert sorted(os.listdir(tmp_path)) == [ 'k2', 'k3', 'k4' ]
+	c.mem.clear()
+	assert c.get('k4') == ('', None, None) # from disk
+	assert list(c.mem.keys()) == [ 'k4' ]
@@ -0,0 +1,91 @@
+# rops-check headless checker
+
+import os, shutil, json
+import pytest
+
+from rops import check, profiles, warmhost
+
+def toolProfile (args):
+	def compile (text, encodedText, encoding, fileName):
+		try:
+			e, o = profiles.cmd(args)
+		except Exception as e:
+			return (args[0] + ': ' + profiles.exMsg(e), None, None)
+		return ((e + o).decode(), [], [])
+	return { 'name': 'tool', 'extensions': ('tool',), 'compile': compile }
+
+@pytest.fixture
+def files (tmp_path):
+	def write (name, text):
+		fileName = tmp_path / name
+		fileName.parent.mkdir(parents=True, exist_ok=True)
+		fileName.write_text(text)
+		return str(fileName)
+	return write
+
+def test_ok (files):
+	assert check.checkFile( (files('a.py', 'x = 1\n'), 'Python') ) == (check.OK, [])
+
+def test_error (files):
+	fileName = files('a.py', 'x = 1\ny = (\n')
+	status, diags = check.checkFile( (fileName, 'Python') )
+	assert status == check.FAILED
+	assert [ (d['severity'], d['line'], d['file']) for d in diags ] == [ ('error', 2, fileName) ]
+	assert check.formatGcc(diags[0]).startswith('%s:2:' % (fileName,))
+	assert json.loads(check.formatJson(diags[0])) == diags[0]
+
+@pytest.mark.parametrize('args, message', (
+	(['sh', '-c', 'echo oops >&2; exit 3'], 'tool error: sh: exit status 3: oops'),
+	(['env', 'LANG=C', 'rops-no-such-tool'], 'tool error: rops-no-such-tool: exit status 127: '),
+	(['rops-no-such-tool'], 'tool error: rops-no-such-tool: can not start: No such file or directory'),
+))
+def test_tool_error (monkeypatch, files, args, message):
+	monkeypatch.setattr(profiles, 'profiles', profiles.profiles + ( toolProfile(args), ))
+	status, diags = check.checkFile( (files('a.tool', ''), 'tool') )
+	assert status == check.TOOL_ERROR
+	assert len(diags) == 1
+	assert diags[0]['message'].startswith(message)
+	assert '\n' not in diags[0]['message']
+
+def test_tool_ok (monkeypatch, files):
+	monkeypatch.setattr(profiles, 'profiles', profiles.profiles + ( toolProfile(['true']), ))
+	assert check.checkFile( (files('a.tool', ''), 'tool') ) == (check.OK, [])
+
+# wineserver is started once by parent, not by workers
+def test_wine (monkeypatch, files):
+	calls = []
+	monkeypatch.setattr(warmhost.wine, 'ensure', lambda: calls.append('ensure'))
+	monkeypatch.setattr(warmhost.wine, 'shutdown', lambda: calls.append('shutdown'))
+	monkeypatch.setattr(profiles, 'mswindows', False)
+	prof = toolProfile(['true'])
+	prof['wine'] = True
+	monkeypatch.setattr(profiles, 'profiles', profiles.profiles + ( prof, ))
+	assert check.main(['-j', '1', files('a.tool', '')]) == check.OK
+	assert check.main(['-j', '1', files('a.py', 'x = 1\n')]) == check.OK
+	assert calls == [ 'ensure', 'shutdown' ]
+
+	server = warmhost.WineServer()
+	server.enabled = False
+	server.ensure()
+	assert server.p is None
+
+def test_walk (files, tmp_path, capsys):
+	files('sub/README.txt', 'text\n') # BlackBox
+	files('sub/a.c', 'int x;\n') # make/C: compileSavedOnly
+	files('.hidden/b.py', 'x = (\n')
+	bad = files('sub/b.py', 'x = (\n')
+	files('c.py', 'x = 1\n')
+	assert check.main(['-j', '1', str(tmp_path)]) == check.FAILED
+	out = capsys.readouterr().out.splitlines()
+	assert len(out) == 1
+	assert out[0].startswith(bad + ':1:')
+
+@pytest.mark.skipif(shutil.which('blackbox') is not None, reason='blackbox is installed')
+def test_explicit (files, capsys):
+	fileName = files('README.txt', 'text\n')
+	assert check.main(['-j', '1', fileName]) == check.TOOL_ERROR
+	assert capsys.readouterr().out == '%s: error: tool error: blackbox: can not start: No such file or directory\n' % (fileName,)
+
+def test_unknown_extension (files, capsys):
+	fileName = files('a.unknown', '')
+	assert check.main([fileName]) == check.FAILED
@@ -0,0 +1,71 @@
+# cocodrivers scanners and parsers:
+# results of the Coco/R generated scanners and parsers of the baseline (data/cocodrivers.json),
+# incremental re-parse (Session) against full parse (Process)
+
+import os, json, random
+import pytest
+
+from rops.cocodrivers import Oberon0, Umbriel
+from rops.cocodrivers.Oberon0 import Scanner as Oberon0Scanner
+from rops.cocodrivers.Umbriel import Scanner as UmbrielScanner
+
+GRAMMARS = { 'ob0': (Oberon0, Oberon0Scanner), 'umb': (Umbriel, UmbrielScanner) }
+
+# [ [grammar, source, errors, tokens], ... ];
+# token: [kind, pos, line, col, len(val) | val (val is not the source slice)]
+with open(os.path.join(os.path.dirname(__file__), 'data', 'cocodrivers.json'), encoding='utf-8') as fh:
+	CASES = json.load(fh)
+
+def caseId (case):
+	return '%s-%d' % (case[0], CASES.index(case))
+
+def tokens (scannerModule, s):
+	scanner = scannerModule.Scanner(s)
+	r = []
+	while True:
+		t = scanner.Scan()
+		r.append( [t.kind, t.pos, t.line, t.col, t.val] )
+		if t.kind == 0:
+			return r
+
+@pytest.mark.parametrize('case', CASES, ids=caseId)
+def test_scanner (case):
+	grammar, s, errs, toks = case
+	expected = [ [kind, pos, line, col, s[pos:pos + x] if type(x) is int else x]
+		for kind, pos, line, col, x in toks ]
+	assert tokens(GRAMMARS[grammar][1], s) == expected
+
+@pytest.mark.parametrize('case', CASES, ids=caseId)
+def test_process (case):
+	grammar, s, errs, toks = case
+	assert [ list(e) for e in GRAMMARS[grammar][0].Process(s) ] == errs
+
+@pytest.mark.parametrize('case', CASES, ids=caseId)
+def test_process_max_errors (case):
+	grammar, s, errs, toks = case
+	for maxErrors in (1, 3):
+		assert [ list(e) for e in GRAMMARS[grammar][0].Process(s, maxErrors) ] == errs[:maxErrors]
+
+ATOMS = ['MODULE', 'BEGIN', 'END', 'PROCEDURE', 'VAR', 'x', '12', '1..', "'s", '"d', ';', '.', ':=',
+	'(', ')', '(*', '*)', '\n', '\r', '\r\n', ' ', 'é']
+
+def edit (rnd, s):
+	p = rnd.randint(0, len(s))
+	if rnd.random() < 0.5:
+		return s[:p] + rnd.choice(ATOMS) + s[p:], p
+	else:
+		return s[:p] + s[p + rnd.randint(1, 6):], p
+
+@pytest.mark.parametrize('explicit', (False, True), ids=('compare', 'editStart'))
+@pytest.mark.parametrize('case', CASES[:8], ids=caseId)
+def test_session (case, explicit):
+	grammar, s, errs, toks = case
+	module = GRAMMARS[grammar][0]
+	rnd = random.Random(s)
+	for maxErrors in (None, 2):
+		session = module.Session()
+		assert session.Process(s, maxErrors) == module.Process(s, maxErrors)
+		for step in range(20):
+			s, p = edit(rnd, s)
+			r = session.Process(s, maxErrors, p if explicit else None)
+			assert r == module.Process(s, maxErrors), (step, s)
@@ -0,0 +1,35 @@
+# encoding detection
+
+import codecs
+import pytest
+
+from rops import encdetect
+
+RU = 'Съешь же ещё этих мягких французских булок, да выпей чаю. ' * 8
+
+def test_quick ():
+	assert encdetect.quick(b'abc\n') == ('ascii', 'abc\n')
+	assert encdetect.quick(RU.encode('utf-8')) == ('utf-8', RU)
+	assert encdetect.quick(codecs.BOM_UTF8 + RU.encode('utf-8')) == ('utf-8-sig', RU)
+	assert encdetect.quick(RU.encode('cp1251')) is None
+
+def test_ascii_compatible ():
+	assert encdetect.asciiCompatible('utf-8')
+	assert encdetect.asciiCompatible('cp1251')
+	assert not encdetect.asciiCompatible('utf-16')
+	assert not encdetect.asciiCompatible('unknown-encoding')
+
+def test_samples ():
+	n = encdetect.SAMPLE_SIZE * encdetect.SAMPLES
+	assert list(encdetect._samples(10)) == [0]
+	assert list(encdetect._samples(n)) == list(range(0, n, encdetect.SAMPLE_SIZE))
+	starts = encdetect._samples(10 * n)
+	assert (len(starts), starts[0], starts[-1]) == (encdetect.SAMPLES, 0, 10 * n - encdetect.SAMPLE_SIZE)
+
+@pytest.mark.skipif(not encdetect.chardetAvailable(), reason='chardet not found')
+@pytest.mark.parametrize('encoding', ('cp1251', 'koi8-r'))
+def test_detect (encoding):
+	data = RU.encode(encoding)
+	assert encdetect.detect(data) == codecs.lookup(encoding).name
+	# large data: samples only
+	assert encdetect.detect(data * (encdetect.SAMPLE_SIZE * encdetect.SAMPLES // len(data) + 10)) == codecs.lookup(encoding).name
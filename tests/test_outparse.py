@@ -0,0 +1,90 @@
+# compiler output parsing: outparse engine, profiles compile functions against results of
+# the baseline per-profile parsing loops (data/outparse.json), streaming partial results
+
+import os, json, random
+import pytest
+
+from rops import outparse, profiles, scratch, util, warmhost
+from rops.outparse import Rule, Spec, ERROR, WARNING
+
+# { 'text', 'name': temp file name, 'cases': [ [function, head of source, fileName, e, o, errs, warns], ... ] }
+with open(os.path.join(os.path.dirname(__file__), 'data', 'outparse.json'), encoding='utf-8') as fh:
+	DATA = json.load(fh)
+
+def links (x):
+	return None if x is None else [ [msgLine, list(pos)] for msgLine, pos in x ]
+
+def test_rules ():
+	spec = Spec( (
+		Rule('([^:\n]+):([0-9]+):([0-9]+): (warning|error): [^\n]*', line=2, col=3,
+			severity=(4, (('warning', WARNING),), ERROR), file=1),
+		Rule('([^:\n]+):([0-9]+): [^\n]*', line=2, severity=ERROR, file=1),
+		Rule('pos ([0-9]+) [^\n]*', pos=1, posBase=1),
+	), stream='e' )
+	e = 'a.c:2:3: warning: w\nb.c:1:1: error: skipped\na.c:4: e\npos 3 x\nnoise\n'
+	errs, warns = outparse.parse(spec, e, 'stdout\n', text='xy\nzw\n', isFile=lambda f: f == 'a.c')
+	assert warns == [ (0, (1, 2)) ]
+	assert errs == [ (2, (3, None)), (3, (1, 1)) ]
+
+def test_stream_o ():
+	spec = Spec( (Rule('([0-9]+): [^\n]*', line=1),) )
+	errs, warns = outparse.parse(spec, 'e1\ne2\n', '3: x\ny\n1: z')
+	assert errs == [ (2, (2, None)), (4, (0, None)) ]
+	assert warns == []
+
+@pytest.fixture
+def mockedCompile (monkeypatch):
+	name = DATA['name']
+	monkeypatch.setattr(scratch, 'writeTemp', lambda *args, **kw: name)
+	monkeypatch.setattr(scratch, 'remove', lambda fileName: None)
+	monkeypatch.setattr(util, 'writeFile', lambda *args, **kw: None)
+	monkeypatch.setattr(warmhost, 'monoAot', lambda exe: None)
+	monkeypatch.setattr(warmhost.wine, 'ensure', lambda: None)
+	monkeypatch.setattr(profiles, 'sameFile', lambda fn1, fn2: fn1 == fn2)
+	monkeypatch.setattr(profiles, 'mswindows', False)
+
+	def run (function, e, o, text, fileName):
+		output = (e.encode('utf-8'), o.encode('utf-8'))
+		monkeypatch.setattr(profiles, 'cmd', lambda *args, **kw: output)
+		monkeypatch.setattr(profiles, 'cmdPollOnly', lambda *args, **kw: output)
+		return getattr(profiles, function)(text, text.encode('utf-8'), 'utf-8', fileName)
+
+	return run
+
+def caseId (case):
+	return '%s-%d' % (case[0], DATA['cases'].index(case))
+
+@pytest.mark.parametrize('case', DATA['cases'], ids=caseId)
+def test_profile_compile (mockedCompile, case):
+	function, head, fileName, e, o, errs, warns = case
+	msg, errs1, warns1 = mockedCompile(function, e, o, head + '\n' + DATA['text'], fileName)
+	assert (links(errs1), links(warns1)) == (errs, warns)
+
+# partial results of output read by chunks give the links of the whole output
+@pytest.mark.parametrize('seed', range(20))
+def test_partial_result (seed):
+	rnd = random.Random(seed)
+	spec = profiles._cOut
+	lines = [ rnd.choice(['a.c:%d:%d: error: x' % (rnd.randint(1, 9), rnd.randint(1, 9)),
+		'a.c:%d:1: warning: y' % (rnd.randint(1, 9),), 'make: ok', 'ü ' * rnd.randint(0, 3)])
+		for i in range(rnd.randint(0, 30)) ]
+	data = ('\n'.join(lines) + '\n').encode('utf-8')
+
+	parts = []
+	partial = profiles.partialResult(parts.append, spec, 'utf-8')
+	pos = 0
+	while pos < len(data):
+		n = rnd.randint(1, 40)
+		partial(data[pos:pos + n], b'')
+		pos = pos + n
+
+	msg, errs, warns = '', [], []
+	for m, e, w in parts:
+		base = msg.count('\n')
+		assert m.endswith('\n')
+		errs.extend( (msgLine + base, p) for msgLine, p in e )
+		warns.extend( (msgLine + base, p) for msgLine, p in w )
+		msg = msg + m
+	assert msg == data.decode('utf-8')
+	assert (errs, warns) == outparse.parse(spec, msg, '')
+	assert len(errs) + len(warns) == sum( 'a.c:' in line for line in lines )
@@ -0,0 +1,35 @@
+# profiles helpers
+
+import pytest
+
+from rops import profiles
+
+# position mapping of the baseline (linear scan per position)
+def posToLineCol0 (src, pos):
+	line = 0
+	for l in map(len, src.split('\n')):
+		if pos > l + 1:
+			pos = pos - l - 1
+			line = line + 1
+		else:
+			return (line, pos)
+
+@pytest.mark.parametrize('text', ('', 'ab', 'ab\n\ncde\n', '\n\n', 'x\r\ny\n z'))
+def test_line_index (text):
+	index = profiles.LineIndex(text)
+	for pos in range(len(text) + 3):
+		assert index.lineCol0(pos) == posToLineCol0(text, pos), pos
+		assert profiles.posToLineCol0(text, pos) == posToLineCol0(text, pos), pos
+
+@pytest.mark.parametrize('compile', (profiles.oberon0Compile, profiles.umbrielCompile))
+def test_coco_max_errors (monkeypatch, compile):
+	text = 'MODULE M; BEGIN ' + 'x := ; ' * 5 + 'END M.'
+	msg, errs, warns = compile(text, text.encode('ascii'), 'ascii', None)
+	assert len(errs) >= 3
+	monkeypatch.setattr(profiles, 'COCO_MAX_ERRORS', 2)
+	msg, errs, warns = compile(text, text.encode('ascii'), 'ascii', None)
+	lines = msg.split('\n')
+	assert (len(lines), lines[-1]) == (3, profiles.tr('#too many errors, parsing stopped'))
+	assert errs[2] == (2, errs[1][1])
+	monkeypatch.setattr(profiles, 'COCO_MAX_ERRORS', None)
+	assert len(compile(text, text.encode('ascii'), 'ascii', None)[1]) >= 3
@@ -0,0 +1,179 @@
+# persistent stores: SQLite database and pickle file fallback, write-behind, migration
+# of pickle files of previous versions; curpos LRU on top of a store table
+
+import os, pickle, sqlite3
+import pytest
+
+from rops import store, curpos
+
+# state of store module as in a new process
+def restart ():
+	store.flush()
+	if store._conn is not None:
+		store._conn.close()
+	store._conn = None
+	store._connFailed = False
+	store._migrated.clear()
+	store._dicts.clear()
+
+@pytest.fixture(params=(True, False), ids=('sqlite', 'pickle'))
+def storeDir (request, monkeypatch, tmp_path):
+	restart()
+	monkeypatch.setattr(store, 'storeDir', str(tmp_path))
+	monkeypatch.setattr(store, 'SQLITE', request.param)
+	monkeypatch.setattr(store, 'FLUSH_DELAY', 60.0) # written by flush only
+	yield str(tmp_path)
+	restart()
+
+def test_load_default (storeDir):
+	default = {'a': 1}
+	x = store.load('settings', default)
+	assert x == {'a': 1}
+	x['a'] = 2
+	assert default == {'a': 1}
+
+def test_save_load (storeDir):
+	store.save('settings', {'font': 'Mono 10', 'x': [1, 2]})
+	x = store.load('settings', {})
+	assert x == {'font': 'Mono 10', 'x': [1, 2]}
+	x['x'].append(3) # copy of stored value
+	assert store.load('settings', {})['x'] == [1, 2]
+
+	# written behind
+	if store.SQLITE:
+		conn = sqlite3.connect(os.path.join(storeDir, store.DB_NAME))
+		try:
+			assert conn.execute('SELECT COUNT(*) FROM kv').fetchone() == (0,)
+		finally:
+			conn.close()
+	else:
+		assert os.listdir(storeDir) == []
+	assert store.flush()
+	restart()
+	assert store.load('settings', {'font': None}) == {'font': 'Mono 10', 'x': [1, 2]}
+
+# other instance saved other keys meanwhile: only keys changed by this one are written
+def test_save_shared (storeDir):
+	if not store.SQLITE:
+		pytest.skip('pickle files are not shared')
+	default = {'font': None, 'delay': 300, 'n': 1000}
+	x = store.load('settings', default)
+	other = sqlite3.connect(os.path.join(storeDir, store.DB_NAME))
+	try:
+		other.executemany('INSERT INTO kv (name, key, stamp, value) VALUES (?, ?, ?, ?)',
+			[ ('settings', key, 1.0, pickle.dumps(value, protocol=2)) for key, value in (('delay', 100), ('n', 10)) ])
+		other.commit()
+	finally:
+		other.close()
+	x['font'] = 'Mono 10'
+	x['n'] = 20
+	store.save('settings', x)
+	store.flush()
+	restart()
+	assert store.load('settings', default) == {'font': 'Mono 10', 'delay': 100, 'n': 20}
+
+def test_migrate_pickle (storeDir):
+	with open(os.path.join(storeDir, 'settings'), 'wb') as fh:
+		pickle.dump({'old': True}, fh, protocol=2)
+	assert store.load('settings', {}) == {'old': True}
+	restart()
+	assert store.load('settings', {}) == {'old': True}
+	if store.SQLITE:
+		assert os.path.exists(os.path.join(storeDir, 'settings.bak'))
+		assert not os.path.exists(os.path.join(storeDir, 'settings'))
+
+def test_table (storeDir):
+	t = store.Table('t')
+	t.putMany( (('a', 1), ('b', 2), ('c', 3)) )
+	t.put('a', 10)
+	assert t.get('a') == 10
+	assert t.get('z', 'none') == 'none'
+	assert t.items() == [ ('b', 2), ('c', 3), ('a', 10) ]
+	t.touch('b')
+	t.touch('z')
+	assert t.items() == [ ('c', 3), ('a', 10), ('b', 2) ]
+	t.delete('c')
+	t.put('d', 4, maxLen=2)
+	assert t.items() == [ ('b', 2), ('d', 4) ]
+
+	restart()
+	t = store.Table('t')
+	assert t.items() == [ ('b', 2), ('d', 4) ]
+
+# changes are kept when write failed
+def test_flush_failed (storeDir, monkeypatch):
+	class FailedTransaction:
+		def __init__ (self, conn):
+			pass
+		def __enter__ (self):
+			raise sqlite3.OperationalError('database is locked')
+		def __exit__ (self, *args):
+			pass
+
+	t = store.Table('t')
+	t.putMany( (('a', 1), ('b', 2)) )
+	store.save('settings', {'a': 1})
+	assert store.flush()
+	t.delete('a')
+	t.put('c', 3)
+	store.save('settings', {'a': 2})
+	with monkeypatch.context() as m:
+		m.setattr(store, '_Transaction', FailedTransaction)
+		m.setattr(store, '_savePickle', lambda name, data: False)
+		assert not store.flush()
+	assert store.flush()
+	restart()
+	assert store.Table('t').items() == [ ('b', 2), ('c', 3) ]
+	assert store.load('settings', {}) == {'a': 2}
+
+def test_table_migrate (storeDir):
+	with open(os.path.join(storeDir, 'curpos'), 'wb') as fh:
+		pickle.dump({'/a': (1, 2, 1), '/b': (3, 4, 0)}, fh, protocol=2)
+	t = store.Table('curpos', curpos._migrate)
+	assert t.items() == [ ('/a', (1, 2)), ('/b', (3, 4)) ]
+	restart()
+	t = store.Table('curpos', curpos._migrate)
+	assert t.items() == [ ('/a', (1, 2)), ('/b', (3, 4)) ]
+
+# other instance trims the table too
+def test_table_shared (storeDir):
+	if not store.SQLITE:
+		pytest.skip('pickle files are not shared')
+	t1 = store.Table('t')
+	t1.putMany( ('k%d' % i, i) for i in range(5) )
+	store.flush()
+	conn = sqlite3.connect(os.path.join(storeDir, store.DB_NAME))
+	try:
+		conn.execute('INSERT INTO kv (name, key, stamp, value) VALUES (?, ?, ?, ?)',
+			('t', 'other', 1e12, pickle.dumps('x', protocol=2)))
+		conn.commit()
+	finally:
+		conn.close()
+	t1.put('k5', 5, maxLen=3)
+	store.flush()
+	restart()
+	assert store.Table('t').items() == [ ('k4', 4), ('k5', 5), ('other', 'x') ]
+
+def test_file_lru (storeDir):
+	lru = curpos.FileLRU(store.Table('lru'), capacity=2)
+	for i in range(4):
+		lru.put('f%d' % i, (i, 0))
+	assert lru.get('f3') == (3, 0)
+	assert lru.get('f0') is None
+	assert lru.get('f2') == (2, 0) # recently used
+	lru.put('f4', (4, 0))
+	restart()
+	lru = curpos.FileLRU(store.Table('lru'), capacity=2)
+	assert [ lru.get('f%d' % i) for i in range(5) ] == [ None, None, (2, 0), None, (4, 0) ]
+
+def test_file_encoding (storeDir, monkeypatch, tmp_path):
+	monkeypatch.setattr(curpos, '_encLru', curpos.FileLRU(store.Table('fileenc')))
+	fileName = str(tmp_path / 'a.txt')
+	with open(fileName, 'w') as fh:
+		fh.write('x\r\n')
+	assert curpos.loadFileEncoding(fileName) is None
+	curpos.saveFileEncoding(fileName, 'cp1251', '\r\n')
+	assert curpos.loadFileEncoding(fileName) == ('cp1251', '\r\n')
+	with open(fileName, 'a') as fh:
+		fh.write('y')
+	assert curpos.loadFileEncoding(fileName) is None
@@ -0,0 +1,24 @@
+# text operations without buffer
+
+from rops import textops
+
+def test_line_sep ():
+	assert textops.detectLineSep('a\r\nb\r\nc\n') == '\r\n'
+	assert textops.detectLineSep('a\rb\r') == '\r'
+	assert textops.detectLineSep('a\nb') == '\n'
+	assert textops.normalizeLineSep('a\r\nb\rc\n', '\n') == 'a\nb\nc\n'
+
+def test_shift_links ():
+	old = 'a\nb\nc\nd\ne'.split('\n')
+	links = [ (0, (0, 1)), (1, (2, 0)), (2, (4, None)), (3, (None, None)) ]
+	# lines inserted after b
+	assert textops.shiftLinks(links, old, 'a\nb\nX\nY\nc\nd\ne'.split('\n')) == \
+		[ (0, (0, 1)), (1, (4, 0)), (2, (6, None)), (3, (None, None)) ]
+	# link to edited line is dropped
+	assert textops.shiftLinks(links, old, 'a\nb\ncZ\nd\ne'.split('\n')) == \
+		[ (0, (0, 1)), (2, (4, None)), (3, (None, None)) ]
+	# lines removed
+	assert textops.shiftLinks(links, old, 'a\ne'.split('\n')) == \
+		[ (0, (0, 1)), (2, (1, None)), (3, (None, None)) ]
+	assert textops.shiftLinks(links, old, old) == links
+	assert textops.shiftLinks(None, old, old) is None
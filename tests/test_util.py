@@ -0,0 +1,50 @@
+# file writes
+
+import os
+import pytest
+
+from rops import util
+
+def test_write_atomic (tmp_path):
+	fileName = str(tmp_path / 'a.txt')
+	util.writeFileAtomic(fileName, b'1')
+	assert util.readFile(fileName) == b'1'
+	os.chmod(fileName, 0o640)
+	ino = os.stat(fileName).st_ino
+	util.writeFileAtomic(fileName, b'2')
+	st = os.stat(fileName)
+	assert (util.readFile(fileName), st.st_mode & 0o777) == (b'2', 0o640)
+	assert st.st_ino != ino # replaced
+	assert os.listdir(tmp_path) == [ 'a.txt' ]
+
+def test_write_atomic_symlink (tmp_path):
+	fileName = str(tmp_path / 'a.txt')
+	util.writeFile(fileName, b'1')
+	os.symlink('a.txt', str(tmp_path / 'link'))
+	util.writeFileAtomic(str(tmp_path / 'link'), b'2')
+	assert os.path.islink(str(tmp_path / 'link'))
+	assert util.readFile(fileName) == b'2'
+
+# hard links are kept: written in place
+def test_write_atomic_hard_link (tmp_path):
+	fileName = str(tmp_path / 'a.txt')
+	util.writeFile(fileName, b'1')
+	os.link(fileName, str(tmp_path / 'b.txt'))
+	util.writeFileAtomic(fileName, b'2')
+	assert util.readFile(str(tmp_path / 'b.txt')) == b'2'
+	assert os.stat(fileName).st_nlink == 2
+
+# directory is not writable: written in place
+@pytest.mark.skipif(os.name != 'posix' or os.geteuid() == 0, reason='root writes anywhere')
+def test_write_atomic_read_only_dir (tmp_path):
+	d = tmp_path / 'd'
+	d.mkdir()
+	fileName = str(d / 'a.txt')
+	util.writeFile(fileName, b'1')
+	os.chmod(str(d), 0o555)
+	try:
+		util.writeFileAtomic(fileName, b'2')
+	finally:
+		os.chmod(str(d), 0o755)
+	assert util.readFile(fileName) == b'2'
+	assert os.listdir(str(d)) == [ 'a.txt' ]